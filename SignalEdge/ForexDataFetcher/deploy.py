@@ -1,44 +1,78 @@
 import subprocess
 import sys
 import os
+import time
+from pathlib import Path
 
-def run_command(cmd, shell=True):
-    """Run a command and return the result"""
-    print(f"Running: {cmd}")
-    result = subprocess.run(cmd, shell=shell, capture_output=True, text=True)
+# Azure CLI path (no quoting needed: commands run without a shell)
+AZ_PATH = r'C:\Program Files\Microsoft SDKs\Azure\CLI2\wbin\az.cmd'
+
+# Each `az` invocation spawns Python + loads azure-cli (~seconds), so cache a
+# successful login check for an hour instead of re-running `az account show`
+# on every deploy
+LOGIN_CACHE = Path.home() / '.cache' / 'signaledge' / 'az_login.json'
+LOGIN_CACHE_TTL = 3600  # seconds
+
+def run_command(args):
+    """Run a command (list of args, no shell) and return the exit code"""
+    print(f"Running: {' '.join(args)}")
+    result = subprocess.run(args, capture_output=True, text=True)
     print(result.stdout)
     if result.stderr:
         print(result.stderr, file=sys.stderr)
     return result.returncode
 
-def main():
-    print("=== Deploying ForexDataFetcher to Azure ===\n")
-
-    # Set the Azure CLI path
-    az_path = r'"C:\Program Files\Microsoft SDKs\Azure\CLI2\wbin\az.cmd"'
+def ensure_logged_in():
+    """Check Azure login, skipping the CLI round-trip on a fresh cache hit"""
+    if LOGIN_CACHE.exists() and time.time() - LOGIN_CACHE.stat().st_mtime < LOGIN_CACHE_TTL:
+        print("Using cached Azure login (verified within the last hour).")
+        return
 
-    # Check if logged in
     print("Checking Azure login status...")
-    result = run_command(f"{az_path} account show")
+    result = subprocess.run([AZ_PATH, 'account', 'show'], capture_output=True, text=True)
 
-    if result != 0:
+    if result.returncode != 0:
         print("\nNot logged in. Please log in to Azure...")
-        run_command(f"{az_path} login")
+        if run_command([AZ_PATH, 'login']) != 0:
+            print("Azure login failed; not caching login state.", file=sys.stderr)
+            return
+        # Re-verify so the cache holds the post-login account state rather
+        # than the failed check's output
+        result = subprocess.run([AZ_PATH, 'account', 'show'], capture_output=True, text=True)
 
-    # List function apps
-    print("\nFetching available Function Apps...")
-    run_command(f'{az_path} functionapp list --query "[].{{Name:name, ResourceGroup:resourceGroup}}" --output table')
+    # Cache only a verified login: writing unconditionally would suppress
+    # the check for an hour after an aborted login, failing every deploy
+    # in that window at publish time
+    if result.returncode == 0:
+        LOGIN_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        LOGIN_CACHE.write_text(result.stdout or '{}')
+
+def main():
+    print("=== Deploying ForexDataFetcher to Azure ===\n")
+
+    ensure_logged_in()
+
+    # Skip the slow `functionapp list` call entirely when the target app is
+    # already known via the environment
+    function_app_name = os.environ.get('FUNCTION_APP_NAME', '').strip()
 
-    # Get function app name
-    function_app_name = input("\nEnter the Function App name (or press Enter for 'signaledge-forex'): ").strip()
     if not function_app_name:
-        function_app_name = "signaledge-forex"
+        print("\nFetching available Function Apps...")
+        run_command([
+            AZ_PATH, 'functionapp', 'list',
+            '--query', '[].{Name:name, ResourceGroup:resourceGroup}',
+            '--output', 'table'
+        ])
+
+        function_app_name = input("\nEnter the Function App name (or press Enter for 'signaledge-forex'): ").strip()
+        if not function_app_name:
+            function_app_name = "signaledge-forex"
 
     print(f"\nDeploying to: {function_app_name}")
     print("This may take a few minutes...\n")
 
     # Deploy
-    result = run_command(f"func azure functionapp publish {function_app_name} --python")
+    result = run_command(['func', 'azure', 'functionapp', 'publish', function_app_name, '--python'])
 
     if result == 0:
         print(f"\n=== Deployment Successful ===")
@@ -2,12 +2,19 @@ import azure.functions as func
 import logging
 import pyodbc
 import requests
-import json
+import ijson
 import os
+import atexit
 import time
+import asyncio
+import threading
+import itertools
 import concurrent.futures
+from collections import namedtuple
 from datetime import datetime
 from pytz import timezone, utc
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 app = func.FunctionApp()
 
@@ -17,6 +24,54 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Shared HTTP session: keep-alive reuses sockets across all currency-pair
+# fetches instead of paying a fresh TCP+TLS handshake per API call
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+SESSION.headers["Accept-Encoding"] = "gzip"
+
+# Cached once: pytz timezone lookups hit the zoneinfo database on every call
+CST = timezone('US/Central')
+
+# Reuse ODBC connections at the driver level (pyodbc's default, made explicit)
+pyodbc.pooling = True
+
+# Lazy module-level connection: the Functions worker survives across timer
+# ticks, so reusing one connection skips DNS + TCP + TLS + SQL login per run
+_CONN = None
+_CONN_LOCK = threading.Lock()
+
+def _is_alive(conn):
+    """Cheap liveness probe for a cached connection"""
+    try:
+        conn.cursor().execute("SELECT 1").fetchone()
+        return True
+    except pyodbc.Error:
+        return False
+
+def get_conn():
+    """Return the shared connection, reconnecting only if it has gone stale"""
+    global _CONN
+    with _CONN_LOCK:
+        if _CONN is None or not _is_alive(_CONN):
+            _CONN = pyodbc.connect(get_connection_string(), autocommit=True, timeout=5)
+        return _CONN
+
+def reset_conn():
+    """Discard the shared connection so the next run reconnects cleanly"""
+    global _CONN
+    with _CONN_LOCK:
+        if _CONN is not None:
+            try:
+                _CONN.close()
+            except pyodbc.Error:
+                pass
+            _CONN = None
+
 def get_connection_string():
     """Get SQL Server connection string from environment variables"""
     server = os.environ.get('SQL_SERVER')
@@ -33,26 +88,194 @@ def get_connection_string():
         f'Encrypt=yes;TrustServerCertificate=no;Connection Timeout=60;LoginTimeout=60;'
     )
 
+# Cached INFORMATION_SCHEMA lookups. The Functions worker is long-lived across
+# timer invocations, so one bulk query per process replaces the per-resource
+# column round-trips on every tick.
+SCHEMA_CACHE = {}
+
+def _load_schema_cache(cursor):
+    """Populate SCHEMA_CACHE with every dbo table's columns in one round-trip"""
+    cursor.execute("""
+        SELECT TABLE_NAME, COLUMN_NAME
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = ?
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """, ('dbo',))
+    for table_name, column_name in cursor.fetchall():
+        SCHEMA_CACHE.setdefault(table_name, []).append(column_name)
+
+def get_column_list(cursor, table_name):
+    """Return the ordered column names for a table, loading the cache on miss"""
+    if table_name not in SCHEMA_CACHE:
+        _load_schema_cache(cursor)
+    return SCHEMA_CACHE.get(table_name, [])
+
+def get_timestamp_column(cursor, table_name):
+    """Determine the correct timestamp column for a target table"""
+    for column_name in get_column_list(cursor, table_name):
+        if column_name in ('Timestamp', 'PublishedAt'):
+            return column_name
+    return None
+
+def invalidate_schema_cache(table_name):
+    """Drop a cached entry so the next lookup re-reads INFORMATION_SCHEMA"""
+    SCHEMA_CACHE.pop(table_name, None)
+
+# One fetch pool for the life of the worker process: spinning up a fresh
+# ThreadPoolExecutor per resource per tick pays thread-creation cost on every
+# run, while a singleton amortizes it across all invocations
+_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get('FOREX_FETCH_CONCURRENCY', '8')),
+    thread_name_prefix="fx-fetch"
+)
+atexit.register(_POOL.shutdown, wait=False)
+
+# CurrencyPairs changes rarely but was queried once per TypeID 2/5/6 resource
+# on every tick; cache the list for an hour
+_PAIRS_CACHE = {"ts": 0, "rows": None}
+
+def get_currency_pairs(cursor):
+    """Return the distinct (BaseCurrency, QuoteCurrency) list, cached with a 1h TTL"""
+    now = time.time()
+    if _PAIRS_CACHE["rows"] is None or now - _PAIRS_CACHE["ts"] > 3600:
+        cursor.execute("""
+            SELECT DISTINCT BaseCurrency, QuoteCurrency
+            FROM CurrencyPairs
+            WHERE BaseCurrency IS NOT NULL AND QuoteCurrency IS NOT NULL
+        """)
+        _PAIRS_CACHE.update(ts=now, rows=cursor.fetchall())
+    return _PAIRS_CACHE["rows"]
+
+# The fields of ResourceRegistry this function actually reads. Fetching only
+# these keeps the row transfer small and makes the code independent of the
+# physical column order in the table.
+Resource = namedtuple("Resource", (
+    "id", "name", "type_id", "target_table", "api_function",
+    "api_interval", "api_endpoint", "create_table_sql", "cte_query"
+))
+
+# Cached response validators (ETag per URL). Most TypeID 1/4 ticks find no
+# new data, so letting the server answer with a 304 saves the body download
+# and JSON parse on those runs.
+_HTTP_VALIDATORS = {}
+
+def fetch_observations(fetch_url, latest_dt):
+    """Conditional GET for FRED-style observation feeds.
+
+    Sends If-Modified-Since (plus a cached ETag when we have one) so the
+    common no-new-data poll costs a header exchange instead of a full
+    download. Returns the parsed JSON payload, or None on HTTP 304.
+    """
+    headers = {"If-Modified-Since": latest_dt.strftime("%a, %d %b %Y %H:%M:%S GMT")}
+    etag = _HTTP_VALIDATORS.get(fetch_url)
+    if etag:
+        headers["If-None-Match"] = etag
+    response = SESSION.get(fetch_url, headers=headers, timeout=10)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    if "ETag" in response.headers:
+        _HTTP_VALIDATORS[fetch_url] = response.headers["ETag"]
+    return response.json()
+
+def merge_fx_rows(cursor, target_table, rows):
+    """Bulk-load (Timestamp, FromSymbol, ToSymbol, OHLC) tuples through a temp
+    staging table and apply them with one set-based MERGE.
+
+    With fast_executemany on, the INSERT into #fx_stage streams the whole row
+    array in one TDS batch (the closest pyodbc gets to the BCP path), and the
+    single MERGE avoids both per-row MERGE plans and server-side JSON parsing
+    on full backfills. Returns the number of rows merged (0 on error).
+    """
+    if not rows:
+        return 0
+    try:
+        cursor.execute("""
+            CREATE TABLE #fx_stage (
+                Timestamp DATETIME NOT NULL,
+                FromSymbol NVARCHAR(8) NOT NULL,
+                ToSymbol NVARCHAR(8) NOT NULL,
+                OpenPrice FLOAT,
+                HighPrice FLOAT,
+                LowPrice FLOAT,
+                ClosePrice FLOAT
+            )
+        """)
+        cursor.executemany(
+            "INSERT INTO #fx_stage (Timestamp, FromSymbol, ToSymbol, OpenPrice, HighPrice, LowPrice, ClosePrice) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        cursor.execute(f"""
+            MERGE INTO {target_table} AS target
+            USING #fx_stage AS source
+            ON target.Timestamp = source.Timestamp
+                AND target.FromSymbol = source.FromSymbol
+                AND target.ToSymbol = source.ToSymbol
+            WHEN MATCHED THEN
+                UPDATE SET
+                    OpenPrice = source.OpenPrice,
+                    HighPrice = source.HighPrice,
+                    LowPrice = source.LowPrice,
+                    ClosePrice = source.ClosePrice
+            WHEN NOT MATCHED THEN
+                INSERT (Timestamp, FromSymbol, ToSymbol, OpenPrice, HighPrice, LowPrice, ClosePrice)
+                VALUES (source.Timestamp, source.FromSymbol, source.ToSymbol, source.OpenPrice, source.HighPrice, source.LowPrice, source.ClosePrice);
+            DROP TABLE #fx_stage;
+        """)
+        return len(rows)
+    except Exception as e:
+        logging.error(f"Error merging FX rows into {target_table}: {e}")
+        try:
+            cursor.execute("IF OBJECT_ID('tempdb..#fx_stage') IS NOT NULL DROP TABLE #fx_stage")
+        except pyodbc.Error:
+            pass
+        return 0
+
+# One run at a time: the timer tick and the manual HTTP trigger both offload
+# to worker threads that share the cached module-level connection, and pyodbc
+# connections must not be used from two threads at once (this run also
+# toggles autocommit mid-flight)
+_RUN_LOCK = threading.Lock()
+
 def fetch_and_store_market_data():
-    """Main function to fetch and store forex market data"""
+    """Main function to fetch and store forex market data
+
+    Runs are serialized on _RUN_LOCK; an overlapping trigger waits for the
+    in-flight run instead of interleaving transactions on the shared
+    connection.
+    """
+    with _RUN_LOCK:
+        _fetch_and_store_market_data()
+
+def _fetch_and_store_market_data():
     try:
         start_ts = time.time()
         budget_seconds = int(os.environ.get('RUN_BUDGET_SECONDS', '540'))  # default 9 minutes
 
-        # Step 1: Connect to SQL Server
+        # Step 1: Connect to SQL Server (shared connection, reused across runs)
         logging.info("Attempting to connect to SQL Server...")
-        connection_string = get_connection_string()
-        conn = pyodbc.connect(connection_string)
+        conn = get_conn()
         cursor = conn.cursor()
+        # Bind all executemany rows as a single parameter array (one TDS batch
+        # instead of one sp_prepexec round-trip per row)
+        cursor.fast_executemany = True
         logging.info("Connected to SQL Server successfully!")
 
+        # One transaction per tick: with autocommit, every MERGE and INSERT
+        # flushed the log individually (~20 syncs on a busy run). Batching the
+        # whole loop into a single commit reduces that to one log flush; on
+        # failure the tick rolls back and the next run redoes it.
+        conn.autocommit = False
+
         # Step 2: Fetch active resources
         cursor.execute("""
-            SELECT *
+            SELECT ResourceID, ResourceName, TypeID, TargetTable, ApiFunction,
+                   ApiInterval, ApiEndpoint, CreateTableSQL, CTEQuery
             FROM ResourceRegistry
             WHERE IsActive = 1
         """)
-        resources = cursor.fetchall()
+        resources = [Resource(*row) for row in cursor.fetchall()]
         logging.info(f"Fetched {len(resources)} active resources.")
 
         if not resources:
@@ -66,65 +289,59 @@ def fetch_and_store_market_data():
                 logging.warning(f"Run budget {budget_seconds}s exceeded; deferring remaining resources to next run.")
                 break
             try:
-                # Unpack the entire resource tuple
-                (
-                    resource_id,
-                    resource_name,
-                    type_id,
-                    description,
-                    source,
-                    impact_description,
-                    registered_date,
-                    is_active,
-                    target_table,
-                    api_function,
-                    api_interval,
-                    api_endpoint,
-                    create_table_sql,
-                    requires_looping,
-                    cte_query,
-                    primary_currency,
-                    secondary_currency,
-                    impact_weight,
-                ) = resource
+                resource_id = resource.id
+                resource_name = resource.name
+                type_id = resource.type_id
+                target_table = resource.target_table
+                api_function = resource.api_function
+                api_interval = resource.api_interval
+                api_endpoint = resource.api_endpoint
+                create_table_sql = resource.create_table_sql
+                cte_query = resource.cte_query
                 logging.info(f"Processing Resource: {resource_name} (ResourceID: {resource_id})")
 
-                # Ensure the table exists
+                # Ensure the table exists and get its latest timestamp
                 try:
                     logging.info(f"Creating or verifying table {target_table}...")
-                    cursor.execute(create_table_sql)
-                    conn.commit()
-                    logging.info(f"Table {target_table} verified or created.")
-                except Exception as e:
-                    logging.error(f"Error creating/verifying table {target_table}: {e}")
-                    continue
-
-                # Get the latest timestamp from the target table
-                try:
-                    # Function to determine the correct timestamp column
-                    def get_timestamp_column(cursor, table_name):
-                        query = f"""
-                        SELECT COLUMN_NAME
-                        FROM INFORMATION_SCHEMA.COLUMNS
-                        WHERE TABLE_NAME = '{table_name}'
-                        AND COLUMN_NAME IN ('Timestamp', 'PublishedAt')
-                        """
-                        cursor.execute(query)
-                        result = cursor.fetchone()
-                        return result[0] if result else None
-
-                    # Get the correct column name
+                    # Get the correct column name (cached per process lifetime)
                     timestamp_column = get_timestamp_column(cursor, target_table)
 
-                    cursor.execute(f"SELECT MAX({timestamp_column}) FROM {target_table}")
-                    latest_timestamp = cursor.fetchone()[0]
+                    if timestamp_column:
+                        # Common case: table already known. Bundle the verify DDL and
+                        # the MAX lookup into a single batch and walk the result sets,
+                        # saving two round-trips per resource per tick.
+                        cursor.execute(f"{create_table_sql};\nSELECT MAX({timestamp_column}) FROM {target_table};")
+                        while cursor.description is None:
+                            cursor.nextset()
+                        latest_timestamp = cursor.fetchone()[0]
+                    else:
+                        # First run for this table: create it, refresh the schema
+                        # cache, then look up the timestamp column
+                        cursor.execute(create_table_sql)
+                        invalidate_schema_cache(target_table)
+                        timestamp_column = get_timestamp_column(cursor, target_table)
+                        cursor.execute(f"SELECT MAX({timestamp_column}) FROM {target_table}")
+                        latest_timestamp = cursor.fetchone()[0]
+
                     latest_timestamp = latest_timestamp.strftime('%Y-%m-%d %H:%M:%S') if latest_timestamp else "1900-01-01 00:00:00"
+                    # Parse once here instead of once per row in the type branches
+                    latest_dt = datetime.strptime(latest_timestamp, '%Y-%m-%d %H:%M:%S')
                     logging.info(f"Latest Timestamp in {target_table}: {latest_timestamp}")
                 except Exception as e:
-                    logging.error(f"Error fetching latest timestamp from {target_table}: {e}")
+                    logging.error(f"Error verifying table or fetching latest timestamp from {target_table}: {e}")
+                    invalidate_schema_cache(target_table)
                     continue
 
-                processed_data = []
+                # Push the freshness filter to the API where supported, so we
+                # stop downloading (and parsing) history we already have.
+                # Disable with API_PUSH_FILTER=false if a provider misbehaves.
+                push_filter = os.environ.get('API_PUSH_FILTER', 'true').lower() == 'true'
+
+                # Columnar buffer for TypeID 1/4 observations: two parallel lists
+                # instead of one dict per row, serialized straight to JSON below
+                obs_timestamps = []
+                obs_values = []
+                obs_value_column = None
 
                 # TypeID 2: Technical Indicators
                 if type_id == 2:
@@ -139,14 +356,9 @@ def fetch_and_store_market_data():
 
                         series_type = "close"
 
-                        # Fetch currency pairs
+                        # Fetch currency pairs (cached across resources and ticks)
                         try:
-                            cursor.execute("""
-                                SELECT BaseCurrency, QuoteCurrency
-                                FROM CurrencyPairs
-                                WHERE BaseCurrency IS NOT NULL AND QuoteCurrency IS NOT NULL
-                            """)
-                            currency_pairs = cursor.fetchall()
+                            currency_pairs = get_currency_pairs(cursor)
                             logging.info(f"Found {len(currency_pairs)} currency pairs for {resource_name} processing.")
                         except Exception as e:
                             logging.error(f"Error fetching currency pairs: {e}")
@@ -155,11 +367,42 @@ def fetch_and_store_market_data():
                         # Initialize counters using a dictionary
                         counters = {"processed_records": 0, "merged_records": 0}
 
-                        # Function to process each currency pair
+                        # Hoist everything constant for this resource out of the
+                        # per-pair worker: one .upper()/format/env lookup per resource
+                        # instead of one per pair
+                        api_key = os.environ.get('ALPHAVANTAGE_API_KEY', 'IOX4MQY1X8GSVZ81')
+                        api_function_upper = api_function.upper()
+                        technical_analysis_key = f"Technical Analysis: {api_function_upper}"
+
+                        # Recent data only needs AlphaVantage's compact window (last
+                        # 100 points, ~100x smaller than full); fall back to full
+                        # when we are more than a month behind
+                        outputsize = "compact" if (datetime.utcnow() - latest_dt).days < 30 else "full"
+
+                        # Build the MERGE text once per resource; only the VALUES row
+                        # list varies per chunk, so SQL Server sees stable statement
+                        # text and can reuse the cached plan per chunk size
+                        merge_sql_template = f"""
+                            MERGE INTO {target_table} AS target
+                            USING (VALUES {{values}}) AS source
+                            (Timestamp, Symbol, {api_function}_Value, Interval, TimePeriod, SeriesType)
+                            ON target.Timestamp = source.Timestamp AND target.Symbol = source.Symbol
+                            WHEN MATCHED THEN
+                                UPDATE SET
+                                    {api_function}_Value = source.{api_function}_Value,
+                                    Interval = source.Interval,
+                                    TimePeriod = source.TimePeriod,
+                                    SeriesType = source.SeriesType
+                            WHEN NOT MATCHED THEN
+                                INSERT (Timestamp, Symbol, {api_function}_Value, Interval, TimePeriod, SeriesType)
+                                VALUES (source.Timestamp, source.Symbol, source.{api_function}_Value, source.Interval, source.TimePeriod, source.SeriesType);
+                        """
+
+                        # Fetch-only worker: returns parsed rows for one pair and never
+                        # touches the shared cursor, so pairs can fetch concurrently while
+                        # all DB writes stay serialized on the main thread
                         def process_currency_pair(pair):
                             base_currency, quote_currency = pair
-                            processed_count = 0
-                            merged_count = 0
 
                             try:
                                 # Format API endpoint
@@ -168,33 +411,30 @@ def fetch_and_store_market_data():
                                     interval=interval,
                                     time_period=time_period,
                                     series_type=series_type,
-                                    apikey=os.environ.get('ALPHAVANTAGE_API_KEY', 'IOX4MQY1X8GSVZ81')
+                                    apikey=api_key
                                 )
+                                if push_filter:
+                                    formatted_api_endpoint += f"&outputsize={outputsize}"
                                 logging.debug(f"Formatted API Endpoint: {formatted_api_endpoint}")
 
-                                # Fetch data from API
-                                response = requests.get(formatted_api_endpoint, timeout=10)
+                                # Stream-parse the technical analysis data: AlphaVantage
+                                # returns newest first, so we can stop as soon as a date
+                                # falls at or below the stored cutoff instead of
+                                # materializing the whole series
+                                response = SESSION.get(formatted_api_endpoint, stream=True, timeout=10)
                                 response.raise_for_status()
-                                api_data = response.json()
+                                response.raw.decode_content = True  # undo gzip for ijson
 
-                                # Parse technical analysis data
-                                technical_analysis_key = f"Technical Analysis: {api_function.upper()}"
-                                technical_analysis = api_data.get(technical_analysis_key, {})
-
-                                if not technical_analysis:
-                                    logging.warning(f"No data found for {api_function} with {base_currency}/{quote_currency}")
-                                    return 0
-
-                                processed_data = []
-                                for date, values in technical_analysis.items():
+                                pair_rows = []
+                                for date, values in ijson.kvitems(response.raw, technical_analysis_key):
                                     if date <= latest_timestamp:
-                                        continue
+                                        break
 
                                     try:
-                                        indicator_value = values.get(api_function.upper())
+                                        indicator_value = values.get(api_function_upper)
                                         if not indicator_value:
                                             continue
-                                        processed_data.append((
+                                        pair_rows.append((
                                             date,
                                             f"{base_currency}/{quote_currency}",
                                             float(indicator_value),
@@ -205,54 +445,43 @@ def fetch_and_store_market_data():
                                     except Exception as e:
                                         logging.error(f"Error parsing data for {date}: {e}")
                                         continue
+                                response.close()
 
-                                # Update processed records
-                                counters["processed_records"] += len(processed_data)
+                                if not pair_rows:
+                                    logging.warning(f"No new data found for {api_function} with {base_currency}/{quote_currency}")
 
-                                if processed_data:
-                                    try:
-                                        cursor.executemany(f"""
-                                            MERGE INTO {target_table} AS target
-                                            USING (VALUES (?, ?, ?, ?, ?, ?)) AS source
-                                            (Timestamp, Symbol, {api_function}_Value, Interval, TimePeriod, SeriesType)
-                                            ON target.Timestamp = source.Timestamp AND target.Symbol = source.Symbol
-                                            WHEN MATCHED THEN
-                                                UPDATE SET
-                                                    {api_function}_Value = source.{api_function}_Value,
-                                                    Interval = source.Interval,
-                                                    TimePeriod = source.TimePeriod,
-                                                    SeriesType = source.SeriesType
-                                            WHEN NOT MATCHED THEN
-                                                INSERT (Timestamp, Symbol, {api_function}_Value, Interval, TimePeriod, SeriesType)
-                                                VALUES (source.Timestamp, source.Symbol, source.{api_function}_Value, source.Interval, source.TimePeriod, source.SeriesType);
-                                        """, processed_data)
-                                        conn.commit()
-
-                                        # Update merged records
-                                        merged_count = len(processed_data)
-                                        counters["merged_records"] += merged_count
-                                    except Exception as e:
-                                        logging.error(f"Error merging data for {base_currency}/{quote_currency}: {e}")
-                                        conn.rollback()
-
-                                # Respect runtime budget between pairs
-                                if time.time() - start_ts > budget_seconds:
-                                    logging.warning("Run budget reached during pair processing; stopping early.")
-                                    return merged_count
-
-                                return merged_count
+                                return pair_rows
 
                             except requests.exceptions.RequestException as e:
                                 logging.error(f"API call failed for {base_currency}/{quote_currency}: {e}")
-                                return 0
+                                return []
                             except Exception as e:
                                 logging.error(f"Error processing API data for {base_currency}/{quote_currency}: {e}")
-                                return 0
+                                return []
 
-                        # Process all currency pairs
+                        # Fetch all currency pairs concurrently on the shared pool:
+                        # each fetch is ~hundreds of ms of pure network wait, so
+                        # overlapping them cuts wall time ~N/W
                         logging.info("Starting parallel processing of currency pairs...")
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                            list(executor.map(process_currency_pair, currency_pairs))
+                        all_rows = [row for rows in _POOL.map(process_currency_pair, currency_pairs) for row in rows]
+
+                        counters["processed_records"] = len(all_rows)
+
+                        # Single merge on the main thread (pyodbc cursors are not
+                        # thread-safe). A multi-row VALUES table gives SQL Server one
+                        # parse/plan/commit per chunk instead of one per row; chunks
+                        # stay under the 2100-parameter statement limit.
+                        if all_rows:
+                            try:
+                                chunk_size = 2000 // 6
+                                for i in range(0, len(all_rows), chunk_size):
+                                    chunk = all_rows[i:i + chunk_size]
+                                    values = ", ".join(["(?, ?, ?, ?, ?, ?)"] * len(chunk))
+                                    flat_params = list(itertools.chain.from_iterable(chunk))
+                                    cursor.execute(merge_sql_template.format(values=values), flat_params)
+                                counters["merged_records"] = len(all_rows)
+                            except Exception as e:
+                                logging.error(f"Error merging data into {target_table}: {e}")
 
                         # Log final results
                         logging.info(f"Total records processed for {resource_name} with ResourceID {resource_id}: {counters['processed_records']}")
@@ -264,22 +493,28 @@ def fetch_and_store_market_data():
                 # TypeID 1: Real GDP
                 if type_id == 1:
                     try:
-                        # Fetch column names dynamically
-                        cursor.execute(f"SELECT * FROM {target_table} WHERE 1=0")
-                        columns = [desc[0] for desc in cursor.description]
+                        # Fetch column names from the schema cache
+                        columns = get_column_list(cursor, target_table)
 
                         if len(columns) != 2 or columns[0] != "Timestamp":
                             raise ValueError("Unexpected table structure. The table must have 'Timestamp' as the first column and one other column.")
 
-                        second_column = columns[1]
+                        obs_value_column = columns[1]
                     except Exception as e:
                         logging.error(f"Error fetching second column name: {e}")
                         continue
                     try:
                         logging.info(f"Processing {resource_name} data...")
-                        response = requests.get(api_endpoint)
-                        response.raise_for_status()
-                        api_data = response.json()
+                        fetch_url = api_endpoint
+                        if push_filter:
+                            # FRED honors observation_start: only rows newer than
+                            # what we already hold come over the wire
+                            separator = '&' if '?' in fetch_url else '?'
+                            fetch_url += f"{separator}observation_start={latest_dt.date()}"
+                        api_data = fetch_observations(fetch_url, latest_dt)
+                        if api_data is None:
+                            logging.info(f"{resource_name}: not modified since {latest_timestamp}; skipping.")
+                            continue
 
                         for record in api_data.get("data", []):
                             date = record.get("date")
@@ -290,11 +525,9 @@ def fetch_and_store_market_data():
 
                             timestamp = f"{date} 00:00:00"
                             if latest_timestamp is None or timestamp > latest_timestamp:
-                                processed_data.append({
-                                    "Timestamp": timestamp,
-                                    second_column: float(value)
-                                })
-                        logging.info(f"Processed {len(processed_data)} new {resource_name} records.")
+                                obs_timestamps.append(timestamp)
+                                obs_values.append(float(value))
+                        logging.info(f"Processed {len(obs_timestamps)} new {resource_name} records.")
                     except Exception as e:
                         logging.error(f"Error processing {resource_name} data: {e}")
 
@@ -302,9 +535,15 @@ def fetch_and_store_market_data():
                 if type_id == 4:
                     try:
                         logging.info(f"Processing {resource_name} data...")
-                        response = requests.get(api_endpoint)
-                        response.raise_for_status()
-                        api_data = response.json()
+                        obs_value_column = "ClosePrice"
+                        fetch_url = api_endpoint
+                        if push_filter:
+                            separator = '&' if '?' in fetch_url else '?'
+                            fetch_url += f"{separator}observation_start={latest_dt.date()}"
+                        api_data = fetch_observations(fetch_url, latest_dt)
+                        if api_data is None:
+                            logging.info(f"{resource_name}: not modified since {latest_timestamp}; skipping.")
+                            continue
                         for record in api_data.get("data", []):
                             date = record.get("date")
                             value = record.get("value")
@@ -312,11 +551,9 @@ def fetch_and_store_market_data():
                                 continue
                             timestamp = f"{date} 00:00:00"
                             if latest_timestamp is None or timestamp > latest_timestamp:
-                                processed_data.append({
-                                    "Timestamp": timestamp,
-                                    "ClosePrice": float(value)
-                                })
-                        logging.info(f"Processed {len(processed_data)} {resource_name} records.")
+                                obs_timestamps.append(timestamp)
+                                obs_values.append(float(value))
+                        logging.info(f"Processed {len(obs_timestamps)} {resource_name} records.")
                     except Exception as e:
                         logging.error(f"Error processing {resource_name} data: {e}")
 
@@ -324,51 +561,55 @@ def fetch_and_store_market_data():
                 if type_id == 5:
                     try:
                         logging.info(f"Processing {resource_name} ...")
-                        cursor.execute("""
-                            SELECT DISTINCT BaseCurrency, QuoteCurrency
-                            FROM CurrencyPairs
-                            WHERE BaseCurrency IS NOT NULL AND QuoteCurrency IS NOT NULL
-                        """)
-                        currency_pairs = cursor.fetchall()
+                        currency_pairs = get_currency_pairs(cursor)
                         logging.info(f"Found {len(currency_pairs)} currency pairs.")
 
-                        for from_symbol, to_symbol in currency_pairs:
+                        # Fetch-only worker (same pattern as TypeID 2): pairs fetch
+                        # concurrently, the merge stays on the main thread
+                        def fetch_intraday_pair(pair):
+                            from_symbol, to_symbol = pair
+                            pair_rows = []
                             try:
                                 formatted_api_endpoint = api_endpoint.format(
                                     from_symbol=from_symbol,
                                     to_symbol=to_symbol
                                 )
                                 logging.info(f"Calling API for {from_symbol}/{to_symbol}: {formatted_api_endpoint}")
-                                response = requests.get(formatted_api_endpoint)
+                                # Stream-parse newest-first bars and stop at the cutoff
+                                response = SESSION.get(formatted_api_endpoint, stream=True, timeout=10)
                                 response.raise_for_status()
-                                api_data = response.json()
-
-                                if "Time Series FX (5min)" not in api_data:
-                                    logging.warning(f"No Time Series data for {from_symbol}/{to_symbol}.")
-                                    continue
+                                response.raw.decode_content = True  # undo gzip for ijson
 
-                                time_series = api_data["Time Series FX (5min)"]
-                                for timestamp, values in time_series.items():
+                                for timestamp, values in ijson.kvitems(response.raw, "Time Series FX (5min)"):
                                     try:
                                         utc_time = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                                        if latest_timestamp and utc_time <= datetime.strptime(latest_timestamp, "%Y-%m-%d %H:%M:%S"):
-                                            continue
-
-                                        cst_time = utc.localize(utc_time).astimezone(timezone('US/Central')).strftime("%Y-%m-%d %H:%M:%S")
-                                        processed_data.append({
-                                            "Timestamp": cst_time,
-                                            "FromSymbol": from_symbol,
-                                            "ToSymbol": to_symbol,
-                                            "OpenPrice": float(values.get("1. open", 0)),
-                                            "HighPrice": float(values.get("2. high", 0)),
-                                            "LowPrice": float(values.get("3. low", 0)),
-                                            "ClosePrice": float(values.get("4. close", 0))
-                                        })
+                                        if utc_time <= latest_dt:
+                                            break
+
+                                        cst_time = utc.localize(utc_time).astimezone(CST).strftime("%Y-%m-%d %H:%M:%S")
+                                        pair_rows.append((
+                                            cst_time,
+                                            from_symbol,
+                                            to_symbol,
+                                            float(values.get("1. open", 0)),
+                                            float(values.get("2. high", 0)),
+                                            float(values.get("3. low", 0)),
+                                            float(values.get("4. close", 0))
+                                        ))
                                     except Exception as e:
                                         logging.error(f"Error processing record for timestamp {timestamp}: {e}")
+                                response.close()
+
+                                if not pair_rows:
+                                    logging.warning(f"No new Time Series data for {from_symbol}/{to_symbol}.")
                             except requests.exceptions.RequestException as e:
                                 logging.error(f"API call failed for {from_symbol}/{to_symbol}: {e}")
-                                continue
+                            return pair_rows
+
+                        fx_rows = [row for rows in _POOL.map(fetch_intraday_pair, currency_pairs) for row in rows]
+
+                        merged = merge_fx_rows(cursor, target_table, fx_rows)
+                        logging.info(f"Merged {merged} {resource_name} records into {target_table}.")
                     except Exception as e:
                         logging.error(f"Error processing {resource_name} : {e}")
 
@@ -376,126 +617,128 @@ def fetch_and_store_market_data():
                 if type_id == 6:
                     try:
                         logging.info("Processing {resource_name} ...")
-                        cursor.execute("""
-                            SELECT DISTINCT BaseCurrency, QuoteCurrency
-                            FROM CurrencyPairs
-                            WHERE BaseCurrency IS NOT NULL AND QuoteCurrency IS NOT NULL
-                        """)
-                        currency_pairs = cursor.fetchall()
+                        currency_pairs = get_currency_pairs(cursor)
                         logging.info(f"Found {len(currency_pairs)} currency pairs.")
 
-                        for from_symbol, to_symbol in currency_pairs:
+                        # Fetch-only worker (same pattern as TypeID 2): pairs fetch
+                        # concurrently, the merge stays on the main thread
+                        def fetch_daily_pair(pair):
+                            from_symbol, to_symbol = pair
+                            pair_rows = []
                             try:
                                 formatted_api_endpoint = api_endpoint.format(
                                     from_symbol=from_symbol,
                                     to_symbol=to_symbol
                                 )
                                 logging.info(f"Calling API for {from_symbol}/{to_symbol}: {formatted_api_endpoint}")
-                                response = requests.get(formatted_api_endpoint)
+                                # Stream-parse newest-first bars and stop at the cutoff
+                                response = SESSION.get(formatted_api_endpoint, stream=True, timeout=10)
                                 response.raise_for_status()
-                                api_data = response.json()
-
-                                if "Time Series FX (Daily)" not in api_data:
-                                    logging.warning(f"No Time Series data for {from_symbol}/{to_symbol}.")
-                                    continue
+                                response.raw.decode_content = True  # undo gzip for ijson
 
-                                time_series = api_data["Time Series FX (Daily)"]
-                                for date, values in time_series.items():
+                                for date, values in ijson.kvitems(response.raw, "Time Series FX (Daily)"):
                                     try:
                                         utc_time = datetime.strptime(date, "%Y-%m-%d")
-                                        if latest_timestamp and utc_time <= datetime.strptime(latest_timestamp, "%Y-%m-%d %H:%M:%S"):
-                                            continue
-
-                                        cst_time = utc.localize(utc_time).astimezone(timezone('US/Central')).strftime("%Y-%m-%d %H:%M:%S")
-                                        processed_data.append({
-                                            "Timestamp": cst_time,
-                                            "FromSymbol": from_symbol,
-                                            "ToSymbol": to_symbol,
-                                            "OpenPrice": float(values.get("1. open", 0)),
-                                            "HighPrice": float(values.get("2. high", 0)),
-                                            "LowPrice": float(values.get("3. low", 0)),
-                                            "ClosePrice": float(values.get("4. close", 0))
-                                        })
+                                        if utc_time <= latest_dt:
+                                            break
+
+                                        cst_time = utc.localize(utc_time).astimezone(CST).strftime("%Y-%m-%d %H:%M:%S")
+                                        pair_rows.append((
+                                            cst_time,
+                                            from_symbol,
+                                            to_symbol,
+                                            float(values.get("1. open", 0)),
+                                            float(values.get("2. high", 0)),
+                                            float(values.get("3. low", 0)),
+                                            float(values.get("4. close", 0))
+                                        ))
                                     except Exception as e:
                                         logging.error(f"Error processing record for date {date}: {e}")
+                                response.close()
+
+                                if not pair_rows:
+                                    logging.warning(f"No new Time Series data for {from_symbol}/{to_symbol}.")
                             except requests.exceptions.RequestException as e:
                                 logging.error(f"API call failed for {from_symbol}/{to_symbol}: {e}")
-                                continue
+                            return pair_rows
+
+                        fx_rows = [row for rows in _POOL.map(fetch_daily_pair, currency_pairs) for row in rows]
 
+                        merged = merge_fx_rows(cursor, target_table, fx_rows)
+                        logging.info(f"Merged {merged} {resource_name} records into {target_table}.")
                     except Exception as e:
                         logging.error(f"Error processing {resource_name}: {e}")
 
                 # Handle data merging and logging
-                if processed_data:
+                if obs_timestamps:
                     try:
                         logging.info(f"Merging data into {target_table}...")
 
-                        # Fetch the column names dynamically
-                        column_query = f"""
-                            SELECT COLUMN_NAME
-                            FROM INFORMATION_SCHEMA.COLUMNS
-                            WHERE TABLE_NAME = '{target_table}'
-                            AND TABLE_SCHEMA = 'dbo'
-                            ORDER BY ORDINAL_POSITION;
-                        """
-
-                        cursor.execute(column_query)
-                        columns = [row.COLUMN_NAME for row in cursor.fetchall()]
-
-                        # Exclude "ID" or auto-increment columns if needed
-                        columns = [col for col in columns if col.lower() != "id"]
-
-                        # Insert data using the CTE query
+                        # Serialize straight from the column lists: timestamps are
+                        # strings we formatted ourselves and values are floats, so no
+                        # intermediate per-row dicts are needed for the JSON payload
                         logging.info("Executing CTE query to insert data...")
-                        json_data = json.dumps(processed_data)
-
-                        # Safely execute the stored CTE query with JSON parameter
-                        safe_cte_query = cte_query.replace("'", "''")
-                        sql = f"EXEC sp_executesql N'{safe_cte_query}', N'@Json NVARCHAR(MAX)', @Json = ?"
-                        cursor.execute(sql, (json_data,))
-                        conn.commit()
-                        logging.info(f"Inserted {len(processed_data)} records into {target_table}.")
-                        conn.commit()
-                        logging.info("Database commit successful.")
+                        json_data = "[%s]" % ",".join(
+                            '{"Timestamp":"%s","%s":%r}' % (ts, obs_value_column, val)
+                            for ts, val in zip(obs_timestamps, obs_values)
+                        )
+
+                        # The stored CTE text names its parameter @Json (no ?
+                        # markers), so it must go through sp_executesql; binding
+                        # the statement text itself keeps our query identical
+                        # across runs (plan-cache hit) with no quote-escaping
+                        cursor.execute(
+                            "EXEC sp_executesql ?, N'@Json NVARCHAR(MAX)', @Json = ?",
+                            (cte_query, json_data)
+                        )
+                        logging.info(f"Inserted {len(obs_timestamps)} records into {target_table}.")
 
                     except Exception as e:
                         logging.error(f"Error during merge operation for {target_table}: {e}")
-                        conn.rollback()
 
             except Exception as e:
                 logging.error(f"Error processing resource {resource_name}: {e}")
 
+        conn.commit()
+        conn.autocommit = True
+        logging.info("Committed tick transaction.")
+
     except Exception as e:
         logging.error(f"Unhandled exception: {e}")
-
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
-            logging.info("SQL Server connection closed.")
+        try:
+            if _CONN is not None:
+                _CONN.rollback()
+        except pyodbc.Error:
+            pass
+        # A failed run may leave the shared connection in a bad state;
+        # discard it so the next invocation reconnects cleanly
+        reset_conn()
 
 
 # Timer trigger: runs once per hour (change to "0 */3 * * * *" after initial data load)
 # Timer trigger: hourly, monitor enabled to avoid overlap
 @app.timer_trigger(schedule="0 0 * * * *", arg_name="myTimer", run_on_startup=True,
               use_monitor=True)
-def ForexDataFetcherTimer(myTimer: func.TimerRequest) -> None:
+async def ForexDataFetcherTimer(myTimer: func.TimerRequest) -> None:
     """Timer-triggered function that runs every hour"""
     if myTimer.past_due:
         logging.info('The timer is past due!')
 
     logging.info('ForexDataFetcher timer trigger function started.')
-    fetch_and_store_market_data()
+    # Offload the blocking orchestration so the worker's event loop stays
+    # free for other invocations during the run
+    await asyncio.to_thread(fetch_and_store_market_data)
     logging.info('ForexDataFetcher timer trigger function completed.')
 
 
 # HTTP trigger for manual execution
 @app.route(route="ForexDataFetcher", auth_level=func.AuthLevel.FUNCTION)
-def ForexDataFetcherHttp(req: func.HttpRequest) -> func.HttpResponse:
+async def ForexDataFetcherHttp(req: func.HttpRequest) -> func.HttpResponse:
     """HTTP-triggered function for manual execution"""
     logging.info('ForexDataFetcher HTTP trigger function started.')
 
     try:
-        fetch_and_store_market_data()
+        await asyncio.to_thread(fetch_and_store_market_data)
         return func.HttpResponse(
             "Forex data fetch completed successfully!",
             status_code=200
@@ -1,9 +1,13 @@
 
 import pyodbc
 import json
+import os
+import sys
 import logging
 import requests
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 
 # Configure logging
 logging.basicConfig(
@@ -15,188 +19,237 @@ logging.basicConfig(
     ]
 )
 
-# # SQL Server connection details
-# server = 'hypv8669.hostedbyappliedi.net'
-# database = 'TradingForeignCurrency'
-# username = 'ali_muwwakkil'
-# password = 'ali00250025'
-# connection_string = (
-#     f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};'
-#     f'DATABASE={database};UID={username};PWD={password}'
-# )
-
-
-# SQL Server connection details
-server = 'CODINGEMPIRE'#'hypv8669.hostedbyappliedi.net'
-database = 'TradingForeignCurrency-'
-# username = 'ali_muwwakkil'
-# password = 'ali00250025'
-connection_string = (
-    f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};'
-    f'DATABASE={database};Trusted_Connection=yes;'
+# Reuse ODBC connections at the driver level (pyodbc's default, made explicit)
+pyodbc.pooling = True
+
+def get_connection_string():
+    """Build the SQL Server connection string from environment variables.
+
+    Same variables as the function apps (SQL_SERVER, SQL_DATABASE,
+    SQL_USERNAME, SQL_PASSWORD); without credentials a trusted connection
+    is used, which covers the local dev box.
+    """
+    server = os.environ.get('SQL_SERVER')
+    database = os.environ.get('SQL_DATABASE')
+    username = os.environ.get('SQL_USERNAME')
+    password = os.environ.get('SQL_PASSWORD')
+
+    if not all([server, database]):
+        raise ValueError("Missing required database settings in environment variables")
+
+    base = (
+        f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};'
+        f'DATABASE={database};'
     )
-#;UID={username};PWD={password}'
-#)
+    if username and password:
+        return base + f'UID={username};PWD={password};'
+    return base + 'Trusted_Connection=yes;'
+
+# Cached module-level connection: reconnecting every run re-pays the TDS
+# login; with pooling on, only a dead connection forces a new one
+_CONN = None
+
+def get_conn():
+    global _CONN
+    if _CONN is not None:
+        try:
+            _CONN.cursor().execute("SELECT 1")
+            return _CONN
+        except pyodbc.Error:
+            _CONN = None
+    _CONN = pyodbc.connect(get_connection_string())
+    return _CONN
 
 
 # API Endpoint
 api_endpoint = "https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers={tickers}&sort=LATEST&limit=2000&apikey=IOX4MQY1X8GSVZ81"
 
+# One C-level tuple fetch per feed item instead of six .get() calls through
+# the interpreter; items missing any of these fields are unusable anyway
+_ITEM_FIELDS = itemgetter(
+    'time_published', 'overall_sentiment_score', 'overall_sentiment_label',
+    'source', 'url', 'summary',
+)
+
+@lru_cache(maxsize=8192)
+def parse_av_ts(s):
+    """Parse AlphaVantage's YYYYMMDDTHHMMSS stamps without strptime.
+
+    Cached because every ticker_sentiment entry of an article shares its
+    time_published, so the same stamp is parsed repeatedly.
+
+    strptime re-runs its format state machine per call, a real cost at
+    thousands of feed items per run; slicing the fixed-width stamp directly
+    is several times faster and keeps the ValueError contract on bad input.
+    """
+    return datetime(
+        int(s[0:4]), int(s[4:6]), int(s[6:8]),
+        int(s[9:11]), int(s[11:13]), int(s[13:15]),
+    )
+
 def fetch_and_store_news_sentiment():
     try:
         # Step 1: Connect to SQL Server
         logging.info("Attempting to connect to SQL Server...")
-        conn = pyodbc.connect(connection_string)
+        conn = get_conn()
         cursor = conn.cursor()
         logging.info("Connected to SQL Server successfully!")
 
 
-        # Step 2: Fetch currency pairs from SQL Server
+        # Step 2: Build the distinct ticker set in SQL. Iterating pairs fetched
+        # the same currency once per pair it appears in (USD is in dozens);
+        # collapsing to distinct currencies server-side means one API call per
+        # currency instead of ~two per pair.
         cursor.execute("""
-            SELECT DISTINCT BaseCurrency, QuoteCurrency
-            FROM CurrencyPairs
-            WHERE BaseCurrency IS NOT NULL AND QuoteCurrency IS NOT NULL
+            SELECT DISTINCT t FROM (
+                SELECT 'FOREX:' + BaseCurrency AS t FROM CurrencyPairs
+                UNION
+                SELECT 'FOREX:' + QuoteCurrency FROM CurrencyPairs
+            ) X WHERE t IS NOT NULL
         """)
-        currency_pairs = cursor.fetchall()
+        tickers = [row[0] for row in cursor.fetchall()]
 
-        if not currency_pairs:
+        if not tickers:
             logging.warning("No currency pairs found in the database!")
 
-        logging.info(f"Found {len(currency_pairs)} currency pairs for sentiment processing.")
+        logging.info(f"Found {len(tickers)} distinct tickers for sentiment processing.")
 
-        processed_data = []
+        # Keyed on (PublishedAt, Ticker): one article mentioning several FOREX
+        # tickers is reached from every ticker that names it, so the same row
+        # would otherwise be appended (and inserted) multiple times
+        processed_map = {}
 
         # Step 3: Fetch Market News & Sentiment Data from API
-        for base_currency, quote_currency in currency_pairs:
-            tickers = [f"FOREX:{base_currency}", f"FOREX:{quote_currency}"]
-            tickers = list(set(tickers))
+        for ticker in tickers:
+            try:
+                formatted_api_endpoint = api_endpoint.format(tickers=ticker)
 
-            for ticker in tickers:
-                try:
-                    formatted_api_endpoint = api_endpoint.format(tickers=ticker)
+                logging.debug(f"Fetching data from API: {formatted_api_endpoint}")
+                response = requests.get(formatted_api_endpoint)
 
-                    logging.debug(f"Fetching data from API: {formatted_api_endpoint}")
-                    response = requests.get(formatted_api_endpoint)
+                if response.status_code != 200:
+                    logging.error(f"API request failed with status code {response.status_code}")
+                    continue
 
-                    if response.status_code != 200:
-                        logging.error(f"API request failed with status code {response.status_code}")
-                        continue
+                api_data = response.json()
 
-                    api_data = response.json()
+                if "feed" not in api_data or not api_data["feed"]:
+                    logging.warning(f"No news data found for ticker: {ticker}")
+                    continue
 
-                    if "feed" not in api_data or not api_data["feed"]:
-                        logging.warning(f"No news data found for ticker: {ticker}")
-                        continue
+                for record in api_data.get("feed", []):
+                    #article_id = record.get("title", "N/A")  # Assuming title as unique ID (Modify as needed)
+                    try:
+                        (published_at, sentiment_score, sentiment_label,
+                         source, article_url, summary) = _ITEM_FIELDS(record)
+                    except KeyError:
+                        continue  # Skip incomplete records
 
-                    for record in api_data.get("feed", []):
-                        #article_id = record.get("title", "N/A")  # Assuming title as unique ID (Modify as needed)
-                        published_at = record.get("time_published")
-                        sentiment_score = record.get("overall_sentiment_score")
-                        sentiment_label = record.get("overall_sentiment_label")
-                        relevance_score = record.get("relevance_score", 0)  # Default to 0 if not available
-                        source = record.get("source")
-                        article_url = record.get("url")
-                        summary = record.get("summary")
-
-                        if not published_at or sentiment_score is None or not sentiment_label:
-                            continue  # Skip incomplete records
-
-                        try:
-                            published_at = datetime.strptime(published_at, "%Y%m%dT%H%M%S")
-                        except ValueError:
-                            logging.error(f"Invalid date format in response: {published_at}")
-                            continue
-
-                        # Extract topics
-                        topics = ", ".join([topic["topic"] for topic in record.get("topics", [])])
-
-                        # Extract ticker sentiment
-                        for ticker_info in record.get("ticker_sentiment", []):
-                            ticker_name = ticker_info.get("ticker", "N/A")
-                            if not ticker_name.startswith("FOREX:"):
-                                continue  # Skip non-FOREX tickers like CRYPTO:BTC or NASDAQ:AAPL
-                            ticker_sentiment_score = float(ticker_info.get("ticker_sentiment_score", 0))
-                            ticker_sentiment_label = ticker_info.get("ticker_sentiment_label", "N/A")
-                            relevance = float(ticker_info.get("relevance_score", 0))
-
-                            processed_data.append((
-                                published_at,
-                                ticker_name,
-                                topics,
-                                ticker_sentiment_score,
-                                ticker_sentiment_label,
-                                relevance,
-                                source,
-                                article_url,
-                                summary
-                            ))
-
-
-                    logging.info(f"Successfully processed {len(processed_data)} records for {ticker}")
-
-                except requests.exceptions.RequestException as e:
-                    logging.error(f"API request error for ticker {ticker}: {e}")
-                except Exception as e:
-                    logging.error(f"Unexpected error while processing ticker {ticker}: {e}")
+                    if not published_at or sentiment_score is None or not sentiment_label:
+                        continue  # Skip incomplete records
 
+                    try:
+                        published_at = parse_av_ts(published_at)
+                    except (ValueError, IndexError):
+                        logging.error(f"Invalid date format in response: {published_at}")
+                        continue
+
+                    # Extract topics (interned: the topic vocabulary is tiny,
+                    # so equal topic sets share one string object)
+                    topics = sys.intern(", ".join(topic["topic"] for topic in record.get("topics", []) if topic.get("topic")))
+
+                    # Extract ticker sentiment
+                    for ticker_info in record.get("ticker_sentiment", []):
+                        ticker_name = ticker_info.get("ticker", "N/A")
+                        if not ticker_name.startswith("FOREX:"):
+                            continue  # Skip non-FOREX tickers like CRYPTO:BTC or NASDAQ:AAPL
+                        ticker_sentiment_score = float(ticker_info.get("ticker_sentiment_score", 0))
+                        ticker_sentiment_label = ticker_info.get("ticker_sentiment_label", "N/A")
+                        relevance = float(ticker_info.get("relevance_score", 0))
+
+                        processed_map.setdefault((published_at, ticker_name), (
+                            published_at,
+                            ticker_name,
+                            topics,
+                            ticker_sentiment_score,
+                            ticker_sentiment_label,
+                            relevance,
+                            source,
+                            article_url,
+                            summary
+                        ))
+
+
+                logging.info(f"Successfully processed {len(processed_map)} records for {ticker}")
+
+            except requests.exceptions.RequestException as e:
+                logging.error(f"API request error for ticker {ticker}: {e}")
+            except Exception as e:
+                logging.error(f"Unexpected error while processing ticker {ticker}: {e}")
+
+        processed_data = list(processed_map.values())
         logging.info(f"Total processed records: {len(processed_data)}")
 
-        # Step 4: Insert data into SQL Server
+        # Drop rows already stored before building the batch: one query for
+        # the recent (PublishedAt, Ticker) keys replaces any per-row lookups,
+        # and in steady state most fetched articles are already present
+        if processed_data:
+            cursor.execute("""
+                SELECT PublishedAt, Ticker
+                FROM [dbo].[Staging_NewsSentiment]
+                WHERE PublishedAt > DATEADD(day, -30, GETDATE())
+            """)
+            existing_keys = {(row[0], row[1]) for row in cursor.fetchall()}
+            before = len(processed_data)
+            processed_data = [rec for rec in processed_data if (rec[0], rec[1]) not in existing_keys]
+            logging.info(f"{before - len(processed_data)} records already present; {len(processed_data)} candidates remain.")
+
+        # Step 4: Insert data into SQL Server. The dedup stays server-side as
+        # the exact backstop: one executemany batch with a WHERE NOT EXISTS
+        # guard replaces the old per-record SELECT + INSERT pair.
         if processed_data:
             insert_query = """
-            INSERT INTO [dbo].[Staging_NewsSentiment] 
-            (PublishedAt, Ticker, Topics, SentimentScore, SentimentLabel, 
+            INSERT INTO [dbo].[Staging_NewsSentiment]
+            (PublishedAt, Ticker, Topics, SentimentScore, SentimentLabel,
             RelevanceScore, Source, ArticleURL, Summary)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (
+                SELECT 1 FROM [dbo].[Staging_NewsSentiment]
+                WHERE PublishedAt = ? AND Ticker = ?
+            )
             """
-            inserted_count = 0  # Track how many were inserted
-
-            for record in processed_data:
-                published_at = record[0]  # Extract PublishedAt (first item in tuple)
-                ticker_name = record[1]
-                
-
-                # Skip if already exists
-                cursor.execute("""
-                    SELECT 1 FROM [dbo].[Staging_NewsSentiment]
-                    WHERE PublishedAt = ? AND Ticker = ? 
-                """, published_at, ticker_name)
-
-                if not cursor.fetchone():
-                    try:
-                        cursor.execute(insert_query, record)
-                        inserted_count += 1
-                    except Exception as e:
-                        logging.error(f"Error inserting record at {published_at}for {ticker_name}: {e}")
-
-
-            conn.commit()
-            logging.info(f"{inserted_count} new records inserted into Market News & Sentiment.")
+            try:
+                cursor.fast_executemany = True
+                cursor.executemany(
+                    insert_query,
+                    [record + (record[0], record[1]) for record in processed_data]
+                )
+                conn.commit()
+                logging.info(f"Batched {len(processed_data)} records into Market News & Sentiment (existing keys skipped server-side).")
+            except Exception as e:
+                logging.error(f"Error batch-inserting records: {e}")
 
         else:
             logging.warning("No data to insert into Market News & Sentiment.")
+            # The cached connection runs with autocommit off; release the
+            # read transaction the SELECTs above opened instead of holding
+            # it until the next run
+            conn.rollback()
 
     except Exception as e:
         logging.error(f"Unhandled exception: {e}")
+        # Drop the cached connection so the next run reconnects cleanly
+        global _CONN
+        if _CONN is not None:
+            try:
+                _CONN.close()
+            except pyodbc.Error:
+                pass
+            _CONN = None
 
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
-            logging.info("SQL Server connection closed.")
-    
-
-import schedule
-import time
-
-def run_scheduled_task():
-    logging.info("Running scheduled forex data fetch...")
-    fetch_and_store_news_sentiment()
 
 if __name__ == "__main__":
-    run_scheduled_task()  # Run once immediately
-    schedule.every(2).minutes.do(run_scheduled_task)
-    logging.info("Scheduler started. Running every 2 minutes.")
-    while True:
-        schedule.run_pending()
-        time.sleep(10)
-    
\ No newline at end of file
+    # Scheduling lives with the Azure Functions timer trigger in
+    # NewsSentimentFetcher/function_app.py; running this module directly
+    # performs a single fetch for local testing.
+    fetch_and_store_news_sentiment()
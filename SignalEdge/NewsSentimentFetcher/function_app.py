@@ -1,16 +1,52 @@
 import azure.functions as func
 import logging
 import os
+import sys
 import pyodbc  # kept for type hints; not used after switching to pytds
 import requests
+import requests_cache
+import asyncio
+import random
+import time
+import tempfile
+import threading
+import concurrent.futures
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+import io
 import json
+import ijson
 import pytds
 import certifi
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 app = func.FunctionApp()
 
+# Shared HTTP session: keep-alive reuses the TLS connection across ticker
+# fetches, and the Retry policy absorbs transient 429/5xx responses. The
+# SQLite-backed cache (15 min TTL plus ETag/Last-Modified revalidation) means
+# unchanged NEWS_SENTIMENT pages come back without a body download or parse;
+# /tmp is the only writable path on the Functions host.
+SESSION = requests_cache.CachedSession(
+    os.path.join(tempfile.gettempdir(), 'av_cache'),
+    backend='sqlite',
+    expire_after=900,
+    cache_control=True,
+)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+    ),
+))
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +56,137 @@ logging.basicConfig(
 logging.getLogger('pytds').setLevel(logging.WARNING)
 
 
+# One C-level tuple fetch per feed item instead of six .get() calls through
+# the interpreter; items missing any of these fields are unusable anyway
+_ITEM_FIELDS = itemgetter(
+    'time_published', 'overall_sentiment_score', 'overall_sentiment_label',
+    'source', 'url', 'summary',
+)
+
+# Client-side throttle matched to the AlphaVantage account tier (default
+# 75 req/min): pacing requests under the quota means the parallel fetchers
+# never burn round-trips on 429 responses. Hand-rolled token bucket so no
+# extra dependency is needed.
+_QPM = int(os.environ.get('ALPHAVANTAGE_QPM', '75'))
+_BUCKET = {"tokens": float(_QPM), "ts": time.monotonic()}
+_BUCKET_LOCK = threading.Lock()
+
+
+def _acquire_token():
+    """Block until the token bucket grants one request slot."""
+    while True:
+        with _BUCKET_LOCK:
+            now = time.monotonic()
+            _BUCKET["tokens"] = min(
+                float(_QPM),
+                _BUCKET["tokens"] + (now - _BUCKET["ts"]) * _QPM / 60.0,
+            )
+            _BUCKET["ts"] = now
+            if _BUCKET["tokens"] >= 1.0:
+                _BUCKET["tokens"] -= 1.0
+                return
+            wait = (1.0 - _BUCKET["tokens"]) * 60.0 / _QPM
+        time.sleep(wait)
+
+
+def get_with_backoff(url, max_retries=6, base=0.5, cap=32):
+    """GET with exponential backoff on rate limits and transient failures.
+
+    The session's urllib3 Retry handles most 429/5xx cases at the adapter
+    level; this adds a jittered retry loop around connection-level errors and
+    any rate-limit responses that exhaust the adapter retries, honoring
+    Retry-After when AlphaVantage sends one. Returns the response, or None
+    once retries are exhausted.
+    """
+    for attempt in range(max_retries):
+        _acquire_token()
+        try:
+            resp = SESSION.get(url, timeout=15)
+        except requests.RequestException as e:
+            logging.warning(f"Request error (attempt {attempt + 1}/{max_retries}): {e}")
+            time.sleep(min(cap, base * 2 ** attempt) + random.uniform(0, 0.25))
+            continue
+
+        if resp.status_code == 429:
+            retry_after = resp.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after else min(cap, base * 2 ** attempt)
+            logging.warning(f"Rate limited; sleeping {delay:.1f}s before retry.")
+            time.sleep(delay + random.uniform(0, 0.25))
+            continue
+        if resp.status_code >= 500:
+            logging.warning(f"Server error {resp.status_code} (attempt {attempt + 1}/{max_retries}).")
+            time.sleep(min(cap, base * 2 ** attempt) + random.uniform(0, 0.25))
+            continue
+
+        return resp
+    return None
+
+
+# Lazy module-level connection: the Functions worker survives across timer
+# ticks, so reusing one connection skips the TLS handshake and TDS login
+# (100-300 ms) on every invocation
+_CONN = None
+_CONN_LOCK = threading.Lock()
+
+
+def get_conn():
+    """Return the shared pytds connection, reconnecting only if it went stale."""
+    global _CONN
+    with _CONN_LOCK:
+        if _CONN is not None:
+            try:
+                _CONN.cursor().execute('SELECT 1')
+                return _CONN
+            except Exception:
+                try:
+                    _CONN.close()
+                except Exception:
+                    pass
+                _CONN = None
+        server, database, username, password = get_db_params()
+        _CONN = pytds.connect(
+            server=server,
+            database=database,
+            user=username,
+            password=password,
+            port=1433,
+            autocommit=False,
+            timeout=30,
+            cafile=certifi.where(),
+        )
+        return _CONN
+
+
+def reset_conn():
+    """Discard the shared connection so the next run reconnects cleanly."""
+    global _CONN
+    with _CONN_LOCK:
+        if _CONN is not None:
+            try:
+                _CONN.close()
+            except Exception:
+                pass
+            _CONN = None
+
+
+@lru_cache(maxsize=8192)
+def parse_av_ts(s):
+    """Parse AlphaVantage's YYYYMMDDTHHMMSS stamps without strptime.
+
+    Cached because every ticker_sentiment entry of an article shares its
+    time_published, so the same stamp is parsed repeatedly.
+
+    strptime re-runs a locale-aware format state machine on every call, a
+    real cost at thousands of feed items per run; direct slicing does the
+    same job several times faster. Raises ValueError on malformed input,
+    matching strptime's behavior.
+    """
+    return datetime(
+        int(s[0:4]), int(s[4:6]), int(s[6:8]),
+        int(s[9:11]), int(s[11:13]), int(s[13:15]),
+    )
+
+
 def get_db_params():
     """Get SQL Server connection params from environment variables."""
     server = os.environ.get('SQL_SERVER')
@@ -33,22 +200,26 @@ def get_db_params():
     return server, database, username, password
 
 
+# One run at a time: the timer tick and the manual HTTP trigger both offload
+# to worker threads that share the cached module-level connection, and pytds
+# connections must not be used from two threads at once (_CONN_LOCK only
+# guards creation, not use)
+_RUN_LOCK = threading.Lock()
+
 def fetch_and_store_news_sentiment():
-    """Fetch Alpha Vantage NEWS_SENTIMENT and store into SQL Server staging table."""
-    conn = None
+    """Fetch Alpha Vantage NEWS_SENTIMENT and store into SQL Server staging table.
+
+    Runs are serialized on _RUN_LOCK; an overlapping trigger waits for the
+    in-flight run instead of interleaving transactions on the shared
+    connection.
+    """
+    with _RUN_LOCK:
+        _fetch_and_store_news_sentiment()
+
+def _fetch_and_store_news_sentiment():
     try:
         logging.info("Connecting to SQL Server via pytds (no ODBC dependency)...")
-        server, database, username, password = get_db_params()
-        conn = pytds.connect(
-            server=server,
-            database=database,
-            user=username,
-            password=password,
-            port=1433,
-            autocommit=False,
-            timeout=30,
-            cafile=certifi.where(),
-        )
+        conn = get_conn()
         cursor = conn.cursor()
         logging.info("Connected to SQL Server.")
 
@@ -63,6 +234,10 @@ def fetch_and_store_news_sentiment():
         rows = cursor.fetchall()
         if not rows:
             logging.warning("No currency pairs found.")
+            # The cached connection runs with autocommit off, so the SELECT
+            # above opened a transaction; release it rather than holding it
+            # until the next tick
+            conn.rollback()
             return
 
         currency_pairs = rows
@@ -78,125 +253,186 @@ def fetch_and_store_news_sentiment():
             "tickers={ticker}&sort=LATEST&limit=2000&apikey={apikey}"
         )
 
-        processed_data = []
-
-        # Step 3: Fetch Market News & Sentiment Data from API
-        for base_currency, quote_currency in currency_pairs:
-            tickers = [f"FOREX:{base_currency}", f"FOREX:{quote_currency}"]
-            tickers = list(set(tickers))
+        # Collapse the pair list to distinct tickers: the same currency shows
+        # up in many pairs, and each ticker only needs one API call
+        unique_tickers = sorted({
+            f"FOREX:{currency}"
+            for base_currency, quote_currency in currency_pairs
+            for currency in (base_currency, quote_currency)
+        })
+        logging.info(f"{len(unique_tickers)} distinct tickers to fetch.")
+
+        # Step 3: Fetch Market News & Sentiment Data from API. The worker is
+        # fetch-only and returns parsed tuples; DB access stays on the main
+        # thread, so tickers can be fetched concurrently (pure network wait).
+        def fetch_ticker(ticker):
+            ticker_rows = []
+            try:
+                url = api_template.format(ticker=ticker, apikey=api_key)
+                logging.debug(f"Fetching NEWS_SENTIMENT for {ticker}")
+                resp = get_with_backoff(url)
+                if resp is None or resp.status_code != 200:
+                    logging.error(f"AlphaVantage API request failed for {ticker}"
+                                  + (f" ({resp.status_code})" if resp is not None else " (retries exhausted)"))
+                    return ticker_rows
+
+                # Stream feed items out of the buffered body with ijson: the
+                # Python object tree for a multi-MB limit=2000 feed is far
+                # larger than the bytes, so materializing one item at a time
+                # caps peak memory. The body itself is already buffered by the
+                # response cache, so only the parse is incremental.
+                feed_item_count = 0
+                for item in ijson.items(io.BytesIO(resp.content), 'feed.item'):
+                    feed_item_count += 1
+                    try:
+                        (published_at, sentiment_score, sentiment_label,
+                         source, article_url, summary) = _ITEM_FIELDS(item)
+                    except KeyError:
+                        continue
 
-            for ticker in tickers:
-                try:
-                    url = api_template.format(ticker=ticker, apikey=api_key)
-                    logging.debug(f"Fetching NEWS_SENTIMENT for {ticker}")
-                    resp = requests.get(url, timeout=15)
-                    if resp.status_code != 200:
-                        logging.error(f"AlphaVantage API error {resp.status_code} for {ticker}")
+                    if not published_at or sentiment_score is None or not sentiment_label:
                         continue
 
-                    payload = resp.json()
-                    feed = payload.get("feed", [])
-                    if not feed:
-                        logging.info(f"No news feed items for {ticker}")
+                    try:
+                        published_dt = parse_av_ts(published_at)
+                    except (ValueError, IndexError):
+                        logging.error(f"Invalid time_published format: {published_at}")
                         continue
 
-                    for item in feed:
-                        published_at = item.get("time_published")
-                        sentiment_score = item.get("overall_sentiment_score")
-                        sentiment_label = item.get("overall_sentiment_label")
-                        relevance_score = item.get("relevance_score", 0)
-                        source = item.get("source")
-                        article_url = item.get("url")
-                        summary = item.get("summary")
-
-                        if not published_at or sentiment_score is None or not sentiment_label:
-                            continue
-
-                        try:
-                            published_dt = datetime.strptime(published_at, "%Y%m%dT%H%M%S")
-                        except ValueError:
-                            logging.error(f"Invalid time_published format: {published_at}")
-                            continue
-
-                        # Extract topics
-                        topics = ", ".join([t.get("topic", "") for t in item.get("topics", []) if t.get("topic")])
-
-                        # Extract ticker sentiment - loop through all ticker_sentiment items
-                        for ticker_info in item.get("ticker_sentiment", []):
-                            ticker_name = ticker_info.get("ticker", "N/A")
-                            if not ticker_name.startswith("FOREX:"):
-                                continue  # Skip non-FOREX tickers like CRYPTO:BTC or NASDAQ:AAPL
-                            ticker_sentiment_score = float(ticker_info.get("ticker_sentiment_score", 0))
-                            ticker_sentiment_label = ticker_info.get("ticker_sentiment_label", "N/A")
-                            relevance = float(ticker_info.get("relevance_score", 0))
-
-                            processed_data.append(
-                                (
-                                    published_dt,
-                                    ticker_name,
-                                    topics,
-                                    ticker_sentiment_score,
-                                    ticker_sentiment_label,
-                                    relevance,
-                                    source,
-                                    article_url,
-                                    summary,
-                                )
+                    # Extract topics. The topic vocabulary is tiny, so intern
+                    # the joined string: items sharing a topic set share one
+                    # string object instead of thousands of equal copies
+                    topics = sys.intern(", ".join(t["topic"] for t in item.get("topics", []) if t.get("topic")))
+
+                    # Extract ticker sentiment - loop through all ticker_sentiment items
+                    for ticker_info in item.get("ticker_sentiment", []):
+                        ticker_name = ticker_info.get("ticker", "N/A")
+                        if not ticker_name.startswith("FOREX:"):
+                            continue  # Skip non-FOREX tickers like CRYPTO:BTC or NASDAQ:AAPL
+                        ticker_sentiment_score = float(ticker_info.get("ticker_sentiment_score", 0))
+                        ticker_sentiment_label = ticker_info.get("ticker_sentiment_label", "N/A")
+                        relevance = float(ticker_info.get("relevance_score", 0))
+
+                        ticker_rows.append(
+                            (
+                                published_dt,
+                                ticker_name,
+                                topics,
+                                ticker_sentiment_score,
+                                ticker_sentiment_label,
+                                relevance,
+                                source,
+                                article_url,
+                                summary,
                             )
+                        )
 
-                    logging.info(f"Successfully processed {len(processed_data)} records for {ticker}")
-
-                except requests.RequestException as e:
-                    logging.error(f"Request error for {ticker}: {e}")
-                except Exception as e:
-                    logging.error(f"Unexpected error for {ticker}: {e}")
+                if not feed_item_count:
+                    logging.info(f"No news feed items for {ticker}")
+                logging.info(f"Successfully processed {len(ticker_rows)} records for {ticker}")
 
+            except requests.RequestException as e:
+                logging.error(f"Request error for {ticker}: {e}")
+            except Exception as e:
+                logging.error(f"Unexpected error for {ticker}: {e}")
+            return ticker_rows
+
+        # Dedup at fan-in on (PublishedAt, Ticker): articles naming several
+        # FOREX tickers come back from every matching ticker fetch
+        processed_map = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            for rows in executor.map(fetch_ticker, unique_tickers):
+                for rec in rows:
+                    processed_map.setdefault((rec[0], rec[1]), rec)
+
+        processed_data = list(processed_map.values())
         logging.info(f"Total processed records: {len(processed_data)}")
 
         if not processed_data:
             logging.warning("No data to insert.")
+            conn.rollback()  # release the read transaction on the cached connection
             return
 
-        # Insert into staging table, skipping existing PublishedAt+Ticker
-        insert_sql = (
+        # In-memory dedup sidecar: one bulk fetch of the recent
+        # (PublishedAt, Ticker) keys lets us drop already-present rows locally,
+        # so in the common steady state (most articles already stored) the
+        # insert batch shrinks to just the genuinely new rows. The
+        # WHERE NOT EXISTS guard below stays as the exact backstop.
+        cursor.execute(
             """
-            INSERT INTO [dbo].[Staging_NewsSentiment]
-            (PublishedAt, Ticker, Topics, SentimentScore, SentimentLabel,
-             RelevanceScore, Source, ArticleURL, Summary)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            SELECT PublishedAt, Ticker
+            FROM [dbo].[Staging_NewsSentiment]
+            WHERE PublishedAt > DATEADD(day, -30, GETDATE())
             """
         )
+        existing_keys = {(row[0], row[1]) for row in cursor.fetchall()}
 
-        inserted_count = 0  # Track how many were inserted
+        new_rows = [rec for rec in processed_data if (rec[0], rec[1]) not in existing_keys]
+        logging.info(f"{len(processed_data) - len(new_rows)} records already present; {len(new_rows)} candidates remain.")
+        if not new_rows:
+            logging.info("All fetched records already stored; nothing to insert.")
+            conn.rollback()  # release the read transaction on the cached connection
+            return
 
-        # Prepare existence check using both PublishedAt and Ticker to avoid collisions
-        for rec in processed_data:
-            published_dt, ticker_name = rec[0], rec[1]
-            try:
-                cursor.execute(
-                    """
-                    SELECT 1 FROM [dbo].[Staging_NewsSentiment]
-                    WHERE PublishedAt = %s AND Ticker = %s
-                    """,
-                    (published_dt, ticker_name),
+        # Bulk-load the candidates through a temp staging table on the TDS
+        # bulk-copy path (pytds copy_to == INSERT BULK, no per-row statement
+        # framing), then apply them with one set-based dedup insert
+        stage_columns = (
+            'PublishedAt', 'Ticker', 'Topics', 'SentimentScore',
+            'SentimentLabel', 'RelevanceScore', 'Source', 'ArticleURL',
+            'Summary',
+        )
+        try:
+            cursor.execute(
+                """
+                CREATE TABLE #news_stage (
+                    PublishedAt DATETIME NOT NULL,
+                    Ticker NVARCHAR(32) NOT NULL,
+                    Topics NVARCHAR(MAX),
+                    SentimentScore FLOAT,
+                    SentimentLabel NVARCHAR(32),
+                    RelevanceScore FLOAT,
+                    Source NVARCHAR(256),
+                    ArticleURL NVARCHAR(2048),
+                    Summary NVARCHAR(MAX)
                 )
-                if cursor.fetchone():
-                    continue
-                cursor.execute(insert_sql, rec)
-                inserted_count += 1
-            except Exception as e:
-                logging.error(f"Insert error for {published_dt} {ticker_name}: {e}")
-
-        conn.commit()
-        logging.info(f"{inserted_count} new records inserted into Market News & Sentiment.")
+                """
+            )
+            cursor.copy_to(table_or_view='#news_stage', data=new_rows, columns=stage_columns)
+            cursor.execute(
+                """
+                INSERT INTO [dbo].[Staging_NewsSentiment]
+                (PublishedAt, Ticker, Topics, SentimentScore, SentimentLabel,
+                 RelevanceScore, Source, ArticleURL, Summary)
+                SELECT s.PublishedAt, s.Ticker, s.Topics, s.SentimentScore, s.SentimentLabel,
+                       s.RelevanceScore, s.Source, s.ArticleURL, s.Summary
+                FROM #news_stage AS s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM [dbo].[Staging_NewsSentiment] AS t
+                    WHERE t.PublishedAt = s.PublishedAt AND t.Ticker = s.Ticker
+                );
+                DROP TABLE #news_stage;
+                """
+            )
+            conn.commit()
+            logging.info(f"Bulk-loaded {len(new_rows)} records into Market News & Sentiment (existing keys skipped server-side).")
+        except Exception as e:
+            logging.error(f"Bulk insert error: {e}")
+            # Roll back so the cached connection doesn't carry the open
+            # transaction — and the session-scoped #news_stage it created —
+            # into the next warm invocation, where the CREATE TABLE would
+            # fail and silently stop inserts until the worker recycles
+            try:
+                conn.rollback()
+            except Exception:
+                reset_conn()
 
     except Exception as e:
         logging.error(f"Unhandled exception: {e}")
+        # A failed run may leave the shared connection mid-transaction;
+        # discard it so the next invocation reconnects cleanly
+        reset_conn()
         raise
-    finally:
-        if conn:
-            conn.close()
-            logging.info("SQL connection closed.")
 
 
 # Timer trigger: hourly
@@ -206,20 +442,22 @@ def fetch_and_store_news_sentiment():
     run_on_startup=False,
     use_monitor=False,
 )
-def NewsSentimentFetcherTimer(myTimer: func.TimerRequest) -> None:
+async def NewsSentimentFetcherTimer(myTimer: func.TimerRequest) -> None:
     if myTimer.past_due:
         logging.info('Timer is past due!')
     logging.info('NewsSentimentFetcher timer trigger started.')
-    fetch_and_store_news_sentiment()
+    # Offload the blocking orchestration so the worker's event loop stays
+    # free for other invocations during the run
+    await asyncio.to_thread(fetch_and_store_news_sentiment)
     logging.info('NewsSentimentFetcher timer trigger completed.')
 
 
 # HTTP trigger for manual execution
 @app.route(route="NewsSentimentFetcher", auth_level=func.AuthLevel.FUNCTION)
-def NewsSentimentFetcherHttp(req: func.HttpRequest) -> func.HttpResponse:
+async def NewsSentimentFetcherHttp(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('NewsSentimentFetcher HTTP trigger started.')
     try:
-        fetch_and_store_news_sentiment()
+        await asyncio.to_thread(fetch_and_store_news_sentiment)
         return func.HttpResponse("News sentiment fetch completed successfully!", status_code=200)
     except Exception as e:
         logging.error(f"HTTP trigger error: {e}")
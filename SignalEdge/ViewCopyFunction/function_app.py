@@ -18,6 +18,9 @@ Optional Environment Variables:
 - SPECIFIC_VIEWS: Comma-separated list of view names (if not set, copies all views)
 - DROP_EXISTING_VIEWS: Set to 'true' to drop existing views before creating (default: true)
 - CREATE_SCHEMAS: Set to 'true' to create missing schemas (default: true)
+- COLLECT_DEPENDENCIES: Set to 'true' to report view dependencies in logs and the
+  summary (default: false). The dependency query itself always runs, since it
+  drives the create order.
 - SYNC_SCHEDULE: Cron expression for timer trigger (default: daily at 2 AM)
 """
 
@@ -25,7 +28,10 @@ import azure.functions as func
 import logging
 import pyodbc
 import os
-import json
+import orjson
+import atexit
+import threading
+import concurrent.futures
 from typing import List, Tuple, Optional, Dict
 from datetime import datetime
 
@@ -43,6 +49,10 @@ def get_connection_string(server: str, database: str, username: str, password: s
         f'DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={server};'
         f'DATABASE={database};UID={username};PWD={password};'
         f'Encrypt=yes;TrustServerCertificate=no;Connection Timeout=60;LoginTimeout=60;'
+        # MARS lets one connection interleave an open catalog cursor with
+        # further queries; 32KB packets cut fragmentation on multi-KB view
+        # definitions (default is 4KB)
+        f'MARS_Connection=yes;Packet Size=32768;'
     )
 
 def get_source_connection():
@@ -73,122 +83,277 @@ def get_target_connection():
     conn_string = get_connection_string(server, database, username, password)
     return pyodbc.connect(conn_string)
 
-def get_view_list(cursor, specific_views: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+# Cached connections: the Functions host reuses the Python worker process
+# across invocations, so paying the TCP+TLS+ODBC login once per process
+# instead of once per invocation saves seconds on every warm run
+_CONN_CACHE = {"source": None, "target": None}
+
+def get_or_create_conn(kind: str):
+    """Return a live cached connection for 'source' or 'target', reconnecting
+    if the cached one has gone stale (probed with SELECT 1)."""
+    conn = _CONN_CACHE[kind]
+    if conn is not None:
+        try:
+            conn.cursor().execute("SELECT 1")
+            return conn
+        except pyodbc.Error:
+            logging.info(f"Cached {kind} connection is stale, reconnecting")
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+            _CONN_CACHE[kind] = None
+
+    conn = get_source_connection() if kind == "source" else get_target_connection()
+    _CONN_CACHE[kind] = conn
+    return conn
+
+def _close_cached_conns():
+    for kind, conn in _CONN_CACHE.items():
+        if conn is not None:
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+            _CONN_CACHE[kind] = None
+
+atexit.register(_close_cached_conns)
+
+def get_view_definitions(cursor, specific_views: Optional[List[str]] = None) -> Tuple[Dict[Tuple[str, str], str], List[Tuple[str, str]]]:
     """
-    Get list of views from the database
-    Returns: List of tuples (schema_name, view_name)
+    Get the CREATE VIEW statement for every view in one round trip
+    Returns: (Dict mapping (schema_name, view_name) to its definition,
+              list of (schema_name, view_name) whose definition is NULL)
+
+    Copying N views previously cost one definition query per view; fetching
+    them all in a single JOIN keeps the per-view work entirely in memory.
+    Views created WITH ENCRYPTION have a NULL definition and are returned
+    separately so callers can report them as failed without aborting the
+    rest of the copy.
     """
     query = """
         SELECT
             SCHEMA_NAME(v.schema_id) AS SchemaName,
-            v.name AS ViewName
+            v.name AS ViewName,
+            m.definition AS Definition
         FROM sys.views v
+        INNER JOIN sys.sql_modules m ON v.object_id = m.object_id
         WHERE v.is_ms_shipped = 0  -- Exclude system views
     """
 
     if specific_views:
-        placeholders = ','.join(['?' for _ in specific_views])
-        query += f" AND v.name IN ({placeholders})"
-        cursor.execute(query, specific_views)
+        # One repeat-concat instead of a list build plus join
+        placeholders = '?' + ',?' * (len(specific_views) - 1)
+        cursor.execute(f"{query} AND v.name IN ({placeholders})", specific_views)
     else:
         cursor.execute(query)
 
-    return [(row.SchemaName, row.ViewName) for row in cursor.fetchall()]
-
-def get_view_definition(cursor, schema_name: str, view_name: str) -> str:
-    """Get the CREATE VIEW statement for a specific view"""
-    query = """
-        SELECT m.definition
-        FROM sys.views v
-        INNER JOIN sys.sql_modules m ON v.object_id = m.object_id
-        WHERE SCHEMA_NAME(v.schema_id) = ?
-        AND v.name = ?
-    """
-    cursor.execute(query, (schema_name, view_name))
-    result = cursor.fetchone()
-
-    if result:
-        definition = result[0]
+    # Iterate the cursor directly: arraysize-sized ODBC block fetches stream
+    # rows instead of materializing the whole result set up front. Positional
+    # indexing (SchemaName, ViewName, Definition) skips pyodbc's per-row
+    # attribute lookup.
+    definitions = {}
+    null_definitions = []
+    for row in cursor:
+        schema_name, view_name, definition = row[0], row[1], row[2]
+
+        if definition is None:
+            null_definitions.append((schema_name, view_name))
+            continue
         definition = definition.strip()
 
         # Ensure definition starts with CREATE VIEW
         if not definition.upper().startswith('CREATE'):
             definition = f"CREATE VIEW [{schema_name}].[{view_name}] AS\n{definition}"
 
-        return definition
-    else:
-        raise ValueError(f"View {schema_name}.{view_name} not found")
+        definitions[(schema_name, view_name)] = definition
+    return definitions, null_definitions
 
-def get_view_dependencies(cursor, schema_name: str, view_name: str) -> List[str]:
-    """Get list of objects that a view depends on"""
+def get_all_view_dependencies(cursor, specific_views: Optional[List[str]] = None) -> Dict[Tuple[str, str], List[str]]:
+    """
+    Get the objects each view depends on, for all views in one round trip
+    Returns: Dict mapping (schema_name, view_name) to a sorted dependency list
+    """
     query = """
         SELECT DISTINCT
+            SCHEMA_NAME(v.schema_id) AS SchemaName,
+            v.name AS ViewName,
             SCHEMA_NAME(o.schema_id) + '.' + o.name AS DependentObject
         FROM sys.views v
         INNER JOIN sys.sql_expression_dependencies sed ON v.object_id = sed.referencing_id
         INNER JOIN sys.objects o ON sed.referenced_id = o.object_id
-        WHERE SCHEMA_NAME(v.schema_id) = ?
-        AND v.name = ?
-        ORDER BY DependentObject
+        WHERE v.is_ms_shipped = 0
     """
     try:
-        cursor.execute(query, (schema_name, view_name))
-        return [row.DependentObject for row in cursor.fetchall()]
+        if specific_views:
+            placeholders = '?' + ',?' * (len(specific_views) - 1)
+            cursor.execute(f"{query} AND v.name IN ({placeholders})", specific_views)
+        else:
+            cursor.execute(query)
+
+        # Positional indexing: (SchemaName, ViewName, DependentObject)
+        dependencies = {}
+        for row in cursor:
+            dependencies.setdefault((row[0], row[1]), []).append(row[2])
+        for deps in dependencies.values():
+            deps.sort()
+        return dependencies
     except Exception as e:
-        logging.warning(f"Could not get dependencies for {schema_name}.{view_name}: {e}")
-        return []
-
-def drop_view_if_exists(cursor, schema_name: str, view_name: str) -> bool:
-    """Drop view if it exists in target database"""
-    drop_sql = f"""
-        IF OBJECT_ID('[{schema_name}].[{view_name}]', 'V') IS NOT NULL
-        DROP VIEW [{schema_name}].[{view_name}];
+        logging.warning(f"Could not get view dependencies: {e}")
+        return {}
+
+# DDL templates hoisted to module level: the helpers below only substitute
+# identifiers instead of rebuilding the statement text on every call
+_DROP_VIEW_TMPL = (
+    "IF OBJECT_ID('[{schema}].[{view}]', 'V') IS NOT NULL "
+    "DROP VIEW [{schema}].[{view}];"
+)
+
+_CREATE_SCHEMA_TMPL = """
+    IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name = '{schema}')
+    BEGIN
+        EXEC('CREATE SCHEMA [{schema}]')
+    END
+"""
+
+def drop_views_batched(cursor, views: List[Tuple[str, str]], batch_size: int = 100) -> None:
+    """Drop existing target views in multi-statement batches
+
+    One round trip per batch_size views instead of one DROP (plus commit) per
+    view; each statement keeps its own IF OBJECT_ID guard so missing views
+    are a no-op.
     """
-    try:
-        cursor.execute(drop_sql)
-        logging.info(f"Dropped existing view {schema_name}.{view_name}")
-        return True
-    except Exception as e:
-        logging.error(f"Could not drop view {schema_name}.{view_name}: {e}")
-        return False
+    statements = [
+        _DROP_VIEW_TMPL.format(schema=schema_name, view=view_name)
+        for schema_name, view_name in views
+    ]
+    for i in range(0, len(statements), batch_size):
+        cursor.execute("\n".join(statements[i:i + batch_size]))
+
+# Schemas confirmed to exist in the target, cached for the lifetime of the
+# warm worker: schemas don't disappear between invocations, so the IF NOT
+# EXISTS round trip is only paid once per schema per process. Cleared via
+# the HTTP ?refresh=1 parameter if the target is rebuilt out of band.
+_known_target_schemas = set()
 
 def create_schema_if_not_exists(cursor, schema_name: str) -> bool:
     """Create schema in target database if it doesn't exist"""
     if schema_name.lower() in ['dbo', 'sys', 'information_schema']:
         return True  # Skip system schemas
 
-    check_sql = f"""
-        IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name = '{schema_name}')
-        BEGIN
-            EXEC('CREATE SCHEMA [{schema_name}]')
-        END
-    """
+    if schema_name in _known_target_schemas:
+        return True
+
+    check_sql = _CREATE_SCHEMA_TMPL.format(schema=schema_name)
     try:
         cursor.execute(check_sql)
-        logging.info(f"Ensured schema {schema_name} exists in target")
+        logging.info("Ensured schema %s exists in target", schema_name)
+        _known_target_schemas.add(schema_name)
         return True
     except Exception as e:
-        logging.error(f"Could not create schema {schema_name}: {e}")
+        logging.error("Could not create schema %s: %s", schema_name, e)
         return False
 
+def group_views_by_dependency_level(views: List[Tuple[str, str]],
+                                    all_dependencies: Dict[Tuple[str, str], List[str]]) -> List[List[Tuple[str, str]]]:
+    """Group views into dependency levels
+
+    Kahn-style pass over the prefetched dependency map, restricted to
+    edges between views in the copy set. Each level only references views
+    from earlier levels, so the members of one level can be created in any
+    order — or concurrently — once the previous levels exist. Views with
+    no interdependencies keep their alphabetical relative order, and a
+    dependency cycle (or edges to objects outside the set) falls back to
+    a final level holding the remainder rather than failing.
+    """
+    view_set = set(views)
+    deps_in_set = {}
+    for view in views:
+        refs = []
+        for dep in all_dependencies.get(view, []):
+            schema_name, _, object_name = dep.partition('.')
+            key = (schema_name, object_name)
+            if key in view_set and key != view:
+                refs.append(key)
+        deps_in_set[view] = refs
+
+    levels = []
+    placed = set()
+    remaining = list(views)
+    while remaining:
+        level = []
+        rest = []
+        for view in remaining:
+            if all(ref in placed for ref in deps_in_set[view]):
+                level.append(view)
+            else:
+                rest.append(view)
+        if not level:
+            # No progress: cycle among the remainder, keep their order
+            logging.warning("Dependency cycle among %d views; creating them in name order", len(rest))
+            levels.append(rest)
+            break
+        placed.update(level)
+        levels.append(level)
+        remaining = rest
+    return levels
+
+def sort_views_by_dependency(views: List[Tuple[str, str]],
+                             all_dependencies: Dict[Tuple[str, str], List[str]]) -> List[Tuple[str, str]]:
+    """Order views so each is created after the views it references"""
+    return [view
+            for level in group_views_by_dependency_level(views, all_dependencies)
+            for view in level]
+
+def create_views_batched(cursor, batch: List[Tuple[int, str, str, str]]) -> Dict[int, str]:
+    """Create a batch of views in one round trip
+
+    CREATE VIEW must be the first statement of its T-SQL batch, so each
+    definition is wrapped in its own EXEC sp_executesql; a TRY/CATCH per
+    view records failures into a table variable returned as the result
+    set. One execute creates the whole batch instead of one per view.
+
+    Args:
+        batch: list of (idx, schema_name, view_name, definition)
+    Returns: Dict mapping idx to the error message for failed creates
+    """
+    parts = [
+        "SET NOCOUNT ON;",
+        "DECLARE @err TABLE (idx INT, msg NVARCHAR(4000));",
+    ]
+    for idx, _schema_name, _view_name, definition in batch:
+        escaped = definition.replace("'", "''")
+        parts.append(
+            f"BEGIN TRY EXEC sp_executesql N'{escaped}'; END TRY "
+            f"BEGIN CATCH INSERT INTO @err VALUES ({idx}, ERROR_MESSAGE()); END CATCH;"
+        )
+    parts.append("SELECT idx, msg FROM @err;")
+    cursor.execute("\n".join(parts))
+    return {row[0]: row[1] for row in cursor}
+
 def create_view(cursor, schema_name: str, view_name: str, definition: str) -> bool:
     """Create view in target database"""
     try:
         cursor.execute(definition)
-        logging.info(f"✓ Created view {schema_name}.{view_name}")
+        logging.info("✓ Created view %s.%s", schema_name, view_name)
         return True
     except Exception as e:
-        logging.error(f"✗ Error creating view {schema_name}.{view_name}: {e}")
-        logging.debug(f"Definition was:\n{definition}")
+        logging.error("✗ Error creating view %s.%s: %s", schema_name, view_name, e)
+        logging.debug("Definition was:\n%s", definition)
         return False
 
-def copy_views_operation() -> Dict:
+def copy_views_operation(specific_views: Optional[List[str]] = None,
+                         drop_existing: Optional[bool] = None,
+                         create_schemas: Optional[bool] = None) -> Dict:
     """
     Main function to copy views from source to target database
     Returns summary dictionary with results
+
+    Arguments left as None fall back to the corresponding environment
+    variable; callers with per-request settings (the HTTP trigger) pass
+    them directly instead of mutating process-global state that the next
+    warm invocation would inherit.
     """
-    source_conn = None
-    target_conn = None
     summary = {
         "start_time": datetime.utcnow().isoformat(),
         "source_database": f"{os.environ.get('SOURCE_SQL_SERVER')}/{os.environ.get('SOURCE_SQL_DATABASE')}",
@@ -202,98 +367,213 @@ def copy_views_operation() -> Dict:
     }
 
     try:
-        # Get configuration
-        specific_views_str = os.environ.get('SPECIFIC_VIEWS')
-        specific_views = None
-        if specific_views_str:
-            specific_views = [v.strip() for v in specific_views_str.split(',')]
+        # Get configuration (explicit arguments win over environment)
+        if specific_views is None:
+            specific_views_str = os.environ.get('SPECIFIC_VIEWS')
+            if specific_views_str:
+                specific_views = [v.strip() for v in specific_views_str.split(',')]
+        if specific_views:
             logging.info(f"Will copy specific views: {specific_views}")
 
-        drop_existing = os.environ.get('DROP_EXISTING_VIEWS', 'true').lower() == 'true'
-        create_schemas = os.environ.get('CREATE_SCHEMAS', 'true').lower() == 'true'
+        if drop_existing is None:
+            drop_existing = os.environ.get('DROP_EXISTING_VIEWS', 'true').lower() == 'true'
+        if create_schemas is None:
+            create_schemas = os.environ.get('CREATE_SCHEMAS', 'true').lower() == 'true'
+        collect_dependencies = os.environ.get('COLLECT_DEPENDENCIES', 'false').lower() == 'true'
 
         # Connect to databases
         logging.info("=" * 60)
         logging.info("STARTING VIEW COPY OPERATION")
         logging.info("=" * 60)
 
-        source_conn = get_source_connection()
+        source_conn = get_or_create_conn("source")
         source_cursor = source_conn.cursor()
+        source_cursor.arraysize = 1000  # ODBC block cursor: fetch 1000 rows per round trip
         logging.info("✓ Connected to source database")
 
-        target_conn = get_target_connection()
+        target_conn = get_or_create_conn("target")
+        target_conn.autocommit = False  # explicit: commits are batched below
         target_cursor = target_conn.cursor()
         logging.info("✓ Connected to target database")
 
-        # Get list of views to copy
-        logging.info("\nFetching view list from source database...")
-        views = get_view_list(source_cursor, specific_views)
-        summary["total_views"] = len(views)
+        # Get every view definition (and, when enabled, the dependency map)
+        # up front: one or two round trips to the source instead of per-view
+        # queries
+        logging.info("\nFetching view definitions from source database...")
+        definitions, null_definitions = get_view_definitions(source_cursor, specific_views)
+        views = sorted(definitions)
+        summary["total_views"] = len(views) + len(null_definitions)
         logging.info(f"Found {len(views)} views to copy")
 
+        # Encrypted views can't be copied; report them as failed instead of
+        # letting one NULL definition abort the whole operation
+        for schema_name, view_name in sorted(null_definitions):
+            logging.error("✗ Cannot copy view %s.%s: definition is NULL (created WITH ENCRYPTION?)",
+                          schema_name, view_name)
+            summary["failed"] += 1
+            summary["view_details"].append({
+                "schema": schema_name,
+                "view": view_name,
+                "status": "failed",
+                "error": "Definition is NULL (view created WITH ENCRYPTION?)",
+                "dependencies": []
+            })
+
         if not views:
             logging.warning("No views found to copy")
             summary["errors"].append("No views found in source database")
             return summary
 
-        # Copy each view
-        for idx, (schema_name, view_name) in enumerate(views, 1):
-            view_result = {
-                "schema": schema_name,
-                "view": view_name,
-                "status": "pending",
-                "error": None,
-                "dependencies": []
-            }
-
+        # The dependency map is one bulk round trip and orders the creates:
+        # a view referencing another view in the set must be created after
+        # it, otherwise its CREATE fails and the copy silently loses it.
+        # COLLECT_DEPENDENCIES only gates reporting in logs and the summary.
+        all_dependencies = get_all_view_dependencies(source_cursor, specific_views)
+        views = sort_views_by_dependency(views, all_dependencies)
+
+        # Schema phase up front: 200 views sharing one schema previously ran
+        # the IF NOT EXISTS check 200 times; each unique schema is now
+        # ensured exactly once, with a single commit
+        if create_schemas:
+            for schema_name in sorted({s for s, _ in views}):
+                create_schema_if_not_exists(target_cursor, schema_name)
+            target_conn.commit()
+
+        # Drop phase up front: batched DDL instead of a DROP round trip (and
+        # commit) per view inside the loop
+        if drop_existing:
             try:
-                logging.info(f"\n[{idx}/{len(views)}] Processing view: {schema_name}.{view_name}")
-
-                # Get view definition from source
-                definition = get_view_definition(source_cursor, schema_name, view_name)
-
-                # Get dependencies (for logging purposes)
-                dependencies = get_view_dependencies(source_cursor, schema_name, view_name)
-                if dependencies:
-                    logging.info(f"  Dependencies: {', '.join(dependencies)}")
-                    view_result["dependencies"] = dependencies
+                drop_views_batched(target_cursor, views)
+                target_conn.commit()
+                logging.info(f"Dropped existing views ({len(views)} checked, batched)")
+            except Exception as e:
+                logging.error(f"Could not drop existing views: {e}")
+                target_conn.rollback()
 
-                # Create schema if needed
-                if create_schemas:
-                    if not create_schema_if_not_exists(target_cursor, schema_name):
+        # Copy each view. With COPY_CONCURRENCY > 1 the creates run on a
+        # thread pool with one connection per worker (pyodbc connections
+        # must not be shared across threads); each worker commits its own
+        # creates, and the pool drains one dependency level at a time so a
+        # view is never created before the views it references.
+        copy_workers = max(1, int(os.environ.get('COPY_CONCURRENCY', '1')))
+
+        if copy_workers > 1:
+            logging.info(f"Copying views with {copy_workers} workers")
+            summary_lock = threading.Lock()
+            worker_state = threading.local()
+            worker_conns = []
+
+            def copy_one(item):
+                idx, (schema_name, view_name) = item
+                view_result = {
+                    "schema": schema_name,
+                    "view": view_name,
+                    "status": "pending",
+                    "error": None,
+                    "dependencies": all_dependencies.get((schema_name, view_name), [])
+                                    if collect_dependencies else []
+                }
+                try:
+                    conn = getattr(worker_state, 'conn', None)
+                    if conn is None:
+                        conn = worker_state.conn = get_target_connection()
+                        conn.autocommit = False
+                        with summary_lock:
+                            worker_conns.append(conn)
+                    logging.info("[%d/%d] Processing view: %s.%s", idx, len(views), schema_name, view_name)
+                    if create_view(conn.cursor(), schema_name, view_name,
+                                   definitions[(schema_name, view_name)]):
+                        conn.commit()
+                        view_result["status"] = "success"
+                    else:
+                        conn.rollback()
                         view_result["status"] = "failed"
-                        view_result["error"] = "Could not create schema"
+                        view_result["error"] = "Create view failed"
+                except Exception as e:
+                    error_msg = str(e)
+                    logging.error("✗ Error processing view %s.%s: %s", schema_name, view_name, error_msg)
+                    view_result["status"] = "failed"
+                    view_result["error"] = error_msg
+                with summary_lock:
+                    if view_result["status"] == "success":
+                        summary["successful"] += 1
+                    else:
                         summary["failed"] += 1
-                        summary["view_details"].append(view_result)
-                        target_conn.rollback()
-                        continue
-                    target_conn.commit()
+                    summary["view_details"].append(view_result)
 
-                # Drop existing view if configured
-                if drop_existing:
-                    drop_view_if_exists(target_cursor, schema_name, view_name)
-                    target_conn.commit()
+            try:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=copy_workers) as executor:
+                    # Barrier between dependency levels: a level's creates
+                    # only start once every view they reference has been
+                    # created and committed by the previous level's workers
+                    next_idx = 1
+                    for level in group_views_by_dependency_level(views, all_dependencies):
+                        list(executor.map(copy_one, enumerate(level, next_idx)))
+                        next_idx += len(level)
+            finally:
+                for conn in worker_conns:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            # map preserves submission order but completion can interleave;
+            # restore the sorted order the sequential path reports in
+            summary["view_details"].sort(key=lambda r: (r["schema"], r["view"]))
 
-                # Create view in target
-                if create_view(target_cursor, schema_name, view_name, definition):
+        else:
+            # Sequential path: creates go out CREATE_BATCH per round trip
+            # through create_views_batched; the server-side TRY/CATCH keeps
+            # one bad definition from failing its batch-mates, which is what
+            # the per-view savepoints used to do. Each batch commits as soon
+            # as it lands: the existing views were already dropped, so a
+            # commit deferred across batches would let a later rollback
+            # discard creates this loop has already reported as successful.
+            CREATE_BATCH = 20
+            for start in range(0, len(views), CREATE_BATCH):
+                batch = [
+                    (start + offset + 1, schema_name, view_name,
+                     definitions[(schema_name, view_name)])
+                    for offset, (schema_name, view_name)
+                    in enumerate(views[start:start + CREATE_BATCH])
+                ]
+                logging.info("\n[%d-%d/%d] Creating view batch",
+                             batch[0][0], batch[-1][0], len(views))
+
+                try:
+                    errors = create_views_batched(target_cursor, batch)
                     target_conn.commit()
-                    view_result["status"] = "success"
-                    summary["successful"] += 1
-                else:
-                    target_conn.rollback()
-                    view_result["status"] = "failed"
-                    view_result["error"] = "Create view failed"
-                    summary["failed"] += 1
-
-            except Exception as e:
-                error_msg = str(e)
-                logging.error(f"✗ Error processing view {schema_name}.{view_name}: {error_msg}")
-                view_result["status"] = "failed"
-                view_result["error"] = error_msg
-                summary["failed"] += 1
-                target_conn.rollback()
-
-            summary["view_details"].append(view_result)
+                except Exception as e:
+                    # The whole round trip failed (e.g. connection dropped):
+                    # every view in the batch is failed and the transaction
+                    # reset for the next batch; committed earlier batches
+                    # are unaffected
+                    logging.error("✗ Error creating view batch: %s", e)
+                    errors = {idx: str(e) for idx, _, _, _ in batch}
+                    try:
+                        target_conn.rollback()
+                    except pyodbc.Error:
+                        pass
+
+                for idx, schema_name, view_name, definition in batch:
+                    view_result = {
+                        "schema": schema_name,
+                        "view": view_name,
+                        "status": "pending",
+                        "error": None,
+                        "dependencies": all_dependencies.get((schema_name, view_name), [])
+                                        if collect_dependencies else []
+                    }
+                    if idx in errors:
+                        logging.error("✗ Error creating view %s.%s: %s",
+                                      schema_name, view_name, errors[idx])
+                        view_result["status"] = "failed"
+                        view_result["error"] = errors[idx]
+                        summary["failed"] += 1
+                    else:
+                        logging.info("✓ Created view %s.%s", schema_name, view_name)
+                        view_result["status"] = "success"
+                        summary["successful"] += 1
+                    summary["view_details"].append(view_result)
 
         # Final summary
         summary["end_time"] = datetime.utcnow().isoformat()
@@ -315,17 +595,11 @@ def copy_views_operation() -> Dict:
         logging.error(error_msg)
         summary["errors"].append(error_msg)
         summary["end_time"] = datetime.utcnow().isoformat()
+        # Drop the cached connections so the next invocation reconnects
+        # cleanly instead of inheriting a possibly broken session
+        _close_cached_conns()
         return summary
 
-    finally:
-        # Close connections
-        if source_conn:
-            source_conn.close()
-            logging.info("Source connection closed")
-        if target_conn:
-            target_conn.close()
-            logging.info("Target connection closed")
-
 
 # =============================================================================
 # Azure Function Triggers
@@ -365,14 +639,21 @@ def ViewCopyHttp(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('ViewCopyFunction HTTP trigger started.')
 
     try:
-        # Check for optional parameters in request
-        specific_views = req.params.get('views')
-        if specific_views:
-            os.environ['SPECIFIC_VIEWS'] = specific_views
+        # Check for optional parameters in request; they are passed straight
+        # to the operation rather than written into os.environ, which would
+        # leak into later invocations of the warm worker
+        if req.params.get('refresh') == '1':
+            _known_target_schemas.clear()
+            logging.info("Request cleared the known-schema cache")
+
+        specific_views = None
+        views_param = req.params.get('views')
+        if views_param:
+            specific_views = [v.strip() for v in views_param.split(',')]
             logging.info(f"Request specified views: {specific_views}")
 
         # Execute copy operation
-        summary = copy_views_operation()
+        summary = copy_views_operation(specific_views=specific_views)
 
         # Format response
         response_data = {
@@ -392,7 +673,7 @@ def ViewCopyHttp(req: func.HttpRequest) -> func.HttpResponse:
             response_data["status"] = "success"
 
         return func.HttpResponse(
-            body=json.dumps(response_data, indent=2),
+            body=orjson.dumps(response_data, option=orjson.OPT_INDENT_2),
             status_code=status_code,
             mimetype="application/json"
         )
@@ -401,10 +682,10 @@ def ViewCopyHttp(req: func.HttpRequest) -> func.HttpResponse:
         error_msg = f"Error in HTTP trigger: {str(e)}"
         logging.error(error_msg)
         return func.HttpResponse(
-            body=json.dumps({
+            body=orjson.dumps({
                 "status": "error",
                 "error": error_msg
-            }, indent=2),
+            }, option=orjson.OPT_INDENT_2),
             status_code=500,
             mimetype="application/json"
         )
@@ -425,24 +706,25 @@ def ViewCopyStatus(req: func.HttpRequest) -> func.HttpResponse:
             "specific_views": os.environ.get('SPECIFIC_VIEWS', 'ALL'),
             "drop_existing_views": os.environ.get('DROP_EXISTING_VIEWS', 'true'),
             "create_schemas": os.environ.get('CREATE_SCHEMAS', 'true'),
+            "collect_dependencies": os.environ.get('COLLECT_DEPENDENCIES', 'false'),
             "sync_schedule": os.environ.get('SYNC_SCHEDULE', '0 0 2 * * *')
         }
 
         return func.HttpResponse(
-            body=json.dumps({
+            body=orjson.dumps({
                 "status": "operational",
                 "configuration": config_info
-            }, indent=2),
+            }, option=orjson.OPT_INDENT_2),
             status_code=200,
             mimetype="application/json"
         )
 
     except Exception as e:
         return func.HttpResponse(
-            body=json.dumps({
+            body=orjson.dumps({
                 "status": "error",
                 "error": str(e)
-            }, indent=2),
+            }, option=orjson.OPT_INDENT_2),
             status_code=500,
             mimetype="application/json"
         )
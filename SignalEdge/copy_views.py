@@ -35,6 +35,10 @@ def get_connection_string(server: str, database: str, username: str, password: s
         f'DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={server};'
         f'DATABASE={database};UID={username};PWD={password};'
         f'Encrypt=yes;TrustServerCertificate=no;Connection Timeout=60;'
+        # MARS lets one connection interleave an open catalog cursor with
+        # further queries; 32KB packets cut fragmentation on multi-KB view
+        # definitions (default is 4KB)
+        f'MARS_Connection=yes;Packet Size=32768;'
     )
 
 def get_source_connection():
@@ -63,42 +67,46 @@ def get_target_connection():
     conn_string = get_connection_string(server, database, username, password)
     return pyodbc.connect(conn_string)
 
-def get_view_list(cursor, specific_views: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+def get_view_definitions(cursor, specific_views: Optional[List[str]] = None) -> Tuple[dict, List[Tuple[str, str]]]:
     """
-    Get list of views from the database
-    Returns: List of tuples (schema_name, view_name)
+    Get the CREATE VIEW statement for every view in one round trip
+    Returns: (Dict mapping (schema_name, view_name) to its definition,
+              list of (schema_name, view_name) whose definition is NULL)
+
+    One JOIN query replaces the per-view definition lookups, so copying N
+    views costs a single round trip to the source instead of N. Views
+    created WITH ENCRYPTION have a NULL definition and are returned
+    separately so one of them doesn't abort the rest of the copy.
     """
     query = """
         SELECT
             SCHEMA_NAME(v.schema_id) AS SchemaName,
-            v.name AS ViewName
+            v.name AS ViewName,
+            m.definition AS Definition
         FROM sys.views v
+        INNER JOIN sys.sql_modules m ON v.object_id = m.object_id
         WHERE v.is_ms_shipped = 0  -- Exclude system views
     """
 
     if specific_views:
-        placeholders = ','.join(['?' for _ in specific_views])
-        query += f" AND v.name IN ({placeholders})"
-        cursor.execute(query, specific_views)
+        # One repeat-concat instead of a list build plus join
+        placeholders = '?' + ',?' * (len(specific_views) - 1)
+        cursor.execute(f"{query} AND v.name IN ({placeholders})", specific_views)
     else:
         cursor.execute(query)
 
-    return [(row.SchemaName, row.ViewName) for row in cursor.fetchall()]
-
-def get_view_definition(cursor, schema_name: str, view_name: str) -> str:
-    """Get the CREATE VIEW statement for a specific view"""
-    query = """
-        SELECT m.definition
-        FROM sys.views v
-        INNER JOIN sys.sql_modules m ON v.object_id = m.object_id
-        WHERE SCHEMA_NAME(v.schema_id) = ?
-        AND v.name = ?
-    """
-    cursor.execute(query, (schema_name, view_name))
-    result = cursor.fetchone()
-
-    if result:
-        definition = result[0]
+    # Iterate the cursor directly: arraysize-sized ODBC block fetches stream
+    # rows instead of materializing the whole result set up front. Positional
+    # indexing (SchemaName, ViewName, Definition) skips pyodbc's per-row
+    # attribute lookup.
+    definitions = {}
+    null_definitions = []
+    for row in cursor:
+        schema_name, view_name, definition = row[0], row[1], row[2]
+
+        if definition is None:
+            null_definitions.append((schema_name, view_name))
+            continue
         # Remove leading/trailing whitespace
         definition = definition.strip()
 
@@ -106,49 +114,74 @@ def get_view_definition(cursor, schema_name: str, view_name: str) -> str:
         if not definition.upper().startswith('CREATE'):
             definition = f"CREATE VIEW [{schema_name}].[{view_name}] AS\n{definition}"
 
-        return definition
-    else:
-        raise ValueError(f"View {schema_name}.{view_name} not found")
+        definitions[(schema_name, view_name)] = definition
+    return definitions, null_definitions
+
+# DDL templates hoisted to module level: the helpers below only substitute
+# identifiers instead of rebuilding the statement text on every call
+_DROP_VIEW_TMPL = (
+    "IF OBJECT_ID('[{schema}].[{view}]', 'V') IS NOT NULL "
+    "DROP VIEW [{schema}].[{view}];"
+)
+
+_CREATE_SCHEMA_TMPL = """
+    IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name = '{schema}')
+    BEGIN
+        EXEC('CREATE SCHEMA [{schema}]')
+    END
+"""
 
-def drop_view_if_exists(cursor, schema_name: str, view_name: str):
-    """Drop view if it exists in target database"""
-    drop_sql = f"""
-        IF OBJECT_ID('[{schema_name}].[{view_name}]', 'V') IS NOT NULL
-        DROP VIEW [{schema_name}].[{view_name}];
+def drop_views_batched(cursor, views: List[Tuple[str, str]], batch_size: int = 100):
+    """Drop existing target views in multi-statement batches
+
+    One round trip per batch_size views instead of one DROP (plus commit) per
+    view; each statement keeps its own IF OBJECT_ID guard so missing views
+    are a no-op.
     """
-    try:
-        cursor.execute(drop_sql)
-        logging.info(f"Dropped existing view {schema_name}.{view_name}")
-    except Exception as e:
-        logging.warning(f"Could not drop view {schema_name}.{view_name}: {e}")
+    statements = [
+        _DROP_VIEW_TMPL.format(schema=schema_name, view=view_name)
+        for schema_name, view_name in views
+    ]
+    for i in range(0, len(statements), batch_size):
+        cursor.execute("\n".join(statements[i:i + batch_size]))
 
 def create_schema_if_not_exists(cursor, schema_name: str):
     """Create schema in target database if it doesn't exist"""
     if schema_name.lower() in ['dbo', 'sys', 'information_schema']:
         return  # Skip system schemas
 
-    check_sql = f"""
-        IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name = '{schema_name}')
-        BEGIN
-            EXEC('CREATE SCHEMA [{schema_name}]')
-        END
-    """
+    check_sql = _CREATE_SCHEMA_TMPL.format(schema=schema_name)
     try:
         cursor.execute(check_sql)
-        logging.info(f"Ensured schema {schema_name} exists")
+        logging.info("Ensured schema %s exists", schema_name)
     except Exception as e:
-        logging.warning(f"Could not create schema {schema_name}: {e}")
+        logging.warning("Could not create schema %s: %s", schema_name, e)
 
-def create_view(cursor, schema_name: str, view_name: str, definition: str):
-    """Create view in target database"""
-    try:
-        cursor.execute(definition)
-        logging.info(f"Created view {schema_name}.{view_name}")
-        return True
-    except Exception as e:
-        logging.error(f"Error creating view {schema_name}.{view_name}: {e}")
-        logging.error(f"Definition was:\n{definition}")
-        return False
+def create_views_batched(cursor, batch: List[Tuple[int, str, str, str]]) -> dict:
+    """Create a batch of views in one round trip
+
+    CREATE VIEW must be the first statement of its T-SQL batch, so each
+    definition is wrapped in its own EXEC sp_executesql; a TRY/CATCH per
+    view records failures into a table variable returned as the result
+    set. One execute creates the whole batch instead of one per view.
+
+    Args:
+        batch: list of (idx, schema_name, view_name, definition)
+    Returns: Dict mapping idx to the error message for failed creates
+    """
+    parts = [
+        "SET NOCOUNT ON;",
+        "DECLARE @err TABLE (idx INT, msg NVARCHAR(4000));",
+    ]
+    for idx, _schema_name, _view_name, definition in batch:
+        escaped = definition.replace("'", "''")
+        parts.append(
+            f"BEGIN TRY EXEC sp_executesql N'{escaped}'; END TRY "
+            f"BEGIN CATCH INSERT INTO @err VALUES ({idx}, ERROR_MESSAGE()); END CATCH;"
+        )
+    parts.append("SELECT idx, msg FROM @err;")
+    cursor.execute("\n".join(parts))
+    return {row[0]: row[1] for row in cursor}
 
 def copy_views(specific_views: Optional[List[str]] = None, dry_run: bool = False):
     """
@@ -166,13 +199,21 @@ def copy_views(specific_views: Optional[List[str]] = None, dry_run: bool = False
         logging.info("Connecting to source database...")
         source_conn = get_source_connection()
         source_cursor = source_conn.cursor()
+        source_cursor.arraysize = 1000  # ODBC block cursor: fetch 1000 rows per round trip
         logging.info("Connected to source database")
 
-        # Get list of views to copy
-        logging.info("Fetching view list from source database...")
-        views = get_view_list(source_cursor, specific_views)
+        # Get every view definition up front (one round trip)
+        logging.info("Fetching view definitions from source database...")
+        definitions, null_definitions = get_view_definitions(source_cursor, specific_views)
+        views = sorted(definitions)
         logging.info(f"Found {len(views)} views to copy")
 
+        # Encrypted views can't be copied; count them as failed instead of
+        # letting one NULL definition abort the whole operation
+        for schema_name, view_name in sorted(null_definitions):
+            logging.error("Cannot copy view %s.%s: definition is NULL (created WITH ENCRYPTION?)",
+                          schema_name, view_name)
+
         if not views:
             logging.warning("No views found to copy")
             return
@@ -184,48 +225,77 @@ def copy_views(specific_views: Optional[List[str]] = None, dry_run: bool = False
             target_cursor = target_conn.cursor()
             logging.info("Connected to target database")
 
-        # Copy each view
-        success_count = 0
-        fail_count = 0
+            # Schema phase up front: each unique schema is ensured once
+            # instead of once per view that lives in it
+            for schema_name in sorted({s for s, _ in views}):
+                create_schema_if_not_exists(target_cursor, schema_name)
+            target_conn.commit()
 
-        for schema_name, view_name in views:
+            # Drop phase up front: batched DDL instead of a DROP round trip
+            # (and commit) per view inside the loop
             try:
-                logging.info(f"\nProcessing view: {schema_name}.{view_name}")
-
-                # Get view definition from source
-                definition = get_view_definition(source_cursor, schema_name, view_name)
-
-                if dry_run:
-                    logging.info(f"[DRY RUN] Would create view {schema_name}.{view_name}")
-                    logging.info(f"Definition:\n{definition}\n")
-                    success_count += 1
-                else:
-                    # Create schema if needed
-                    create_schema_if_not_exists(target_cursor, schema_name)
-                    target_conn.commit()
-
-                    # Drop existing view if it exists
-                    drop_view_if_exists(target_cursor, schema_name, view_name)
+                drop_views_batched(target_cursor, views)
+                target_conn.commit()
+                logging.info(f"Dropped existing views ({len(views)} checked, batched)")
+            except Exception as e:
+                logging.warning(f"Could not drop existing views: {e}")
+                target_conn.rollback()
+
+        # Copy each view. Creates go out CREATE_BATCH per round trip through
+        # create_views_batched; the server-side TRY/CATCH keeps one bad
+        # definition from failing its batch-mates, which is what the per-view
+        # savepoints used to do. Each batch commits as soon as it lands: the
+        # existing views were already dropped, so a commit deferred across
+        # batches would let a later rollback discard creates this loop has
+        # already reported as successful.
+        CREATE_BATCH = 20
+        success_count = 0
+        fail_count = len(null_definitions)
+
+        if dry_run:
+            for schema_name, view_name in views:
+                logging.info("[DRY RUN] Would create view %s.%s", schema_name, view_name)
+                logging.info("Definition:\n%s\n", definitions[(schema_name, view_name)])
+                success_count += 1
+        else:
+            for start in range(0, len(views), CREATE_BATCH):
+                batch = [
+                    (start + offset + 1, schema_name, view_name,
+                     definitions[(schema_name, view_name)])
+                    for offset, (schema_name, view_name)
+                    in enumerate(views[start:start + CREATE_BATCH])
+                ]
+                logging.info("\n[%d-%d/%d] Creating view batch",
+                             batch[0][0], batch[-1][0], len(views))
+
+                try:
+                    errors = create_views_batched(target_cursor, batch)
                     target_conn.commit()
-
-                    # Create view in target
-                    if create_view(target_cursor, schema_name, view_name, definition):
-                        target_conn.commit()
-                        success_count += 1
-                    else:
+                except Exception as e:
+                    # The whole round trip failed (e.g. connection dropped):
+                    # every view in the batch is failed and the transaction
+                    # reset for the next batch; committed earlier batches
+                    # are unaffected
+                    logging.error("Error creating view batch: %s", e)
+                    errors = {idx: str(e) for idx, _, _, _ in batch}
+                    try:
                         target_conn.rollback()
-                        fail_count += 1
+                    except pyodbc.Error:
+                        pass
 
-            except Exception as e:
-                logging.error(f"Error processing view {schema_name}.{view_name}: {e}")
-                if target_conn:
-                    target_conn.rollback()
-                fail_count += 1
+                for idx, schema_name, view_name, definition in batch:
+                    if idx in errors:
+                        logging.error("Error creating view %s.%s: %s",
+                                      schema_name, view_name, errors[idx])
+                        fail_count += 1
+                    else:
+                        logging.info("Created view %s.%s", schema_name, view_name)
+                        success_count += 1
 
         # Summary
         logging.info(f"\n{'='*60}")
         logging.info(f"SUMMARY:")
-        logging.info(f"Total views processed: {len(views)}")
+        logging.info(f"Total views processed: {len(views) + len(null_definitions)}")
         logging.info(f"Successful: {success_count}")
         logging.info(f"Failed: {fail_count}")
         logging.info(f"{'='*60}")
@@ -1,20 +1,70 @@
+import hashlib
+import io
 import os
-from gtts import gTTS
-import pyttsx3
+import tempfile
 from dotenv import load_dotenv
 
+# Synthesized gTTS audio cached on local disk: each synthesis is a
+# synchronous HTTP request to Google, so repeated identical texts in a warm
+# worker should pay it once
+_TTS_CACHE_DIR = os.path.join(tempfile.gettempdir(), "tts_cache")
+
 class VoiceGenerator:
     def __init__(self):
-        # Initialize text-to-speech engine
-        self.engine = pyttsx3.init()
-        
+        # Text-to-speech engine is created lazily: pyttsx3.init() loads the
+        # platform TTS driver (SAPI5/NSSpeechSynthesizer/espeak), which takes
+        # seconds and is wasted work when callers only use gTTS
+        self._engine = None
+
         # Load environment variables
         load_dotenv()
-        
+
+    @property
+    def engine(self):
+        """Offline pyttsx3 engine, initialized on first use"""
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+        return self._engine
+
+    def generate_speech_bytes(self, text, lang='en', slow=False):
+        """
+        Generate speech with gTTS and return the MP3 audio as bytes.
+
+        Streams the HTTP response into memory via write_to_fp instead of
+        gTTS.save(), so nothing but the cache touches disk; callers decide
+        where (or whether) to persist the audio.
+
+        Args:
+            text (str): Text to convert to speech
+            lang (str): gTTS language code
+            slow (bool): Whether to synthesize at the slower speaking rate
+        """
+        key = hashlib.sha256(f"{lang}|{slow}|{text}".encode()).hexdigest()
+        cached = os.path.join(_TTS_CACHE_DIR, f"{key}.mp3")
+
+        if os.path.exists(cached):
+            with open(cached, 'rb') as f:
+                return f.read()
+
+        from gtts import gTTS
+        buf = io.BytesIO()
+        gTTS(text=text, lang=lang, slow=slow).write_to_fp(buf)
+        audio = buf.getvalue()
+
+        # Publish to the cache atomically: write a temp name first so a
+        # half-written file is never visible under the cache key
+        os.makedirs(_TTS_CACHE_DIR, exist_ok=True)
+        partial = f"{cached}.{os.getpid()}.part"
+        with open(partial, 'wb') as f:
+            f.write(audio)
+        os.replace(partial, cached)
+        return audio
+
     def generate_speech(self, text, output_file="output.mp3", use_gtts=False):
         """
         Generate speech from text using either pyttsx3 (offline) or gTTS (online).
-        
+
         Args:
             text (str): Text to convert to speech
             output_file (str): Output audio file name
@@ -22,23 +72,26 @@ class VoiceGenerator:
         """
         try:
             if use_gtts:
-                # Use Google Text-to-Speech (requires internet connection)
-                tts = gTTS(text=text, lang='en')
-                tts.save(output_file)
+                # Use Google Text-to-Speech (requires internet connection),
+                # serving repeated texts from the on-disk cache; the audio
+                # is synthesized in memory and written out once
+                audio = self.generate_speech_bytes(text)
+                with open(output_file, 'wb') as f:
+                    f.write(audio)
                 print(f"Speech generated and saved to {output_file}")
             else:
                 # Use pyttsx3 (offline text-to-speech)
                 self.engine.say(text)
                 self.engine.runAndWait()
                 print("Speech generated using offline engine")
-                
+
         except Exception as e:
             print(f"Error generating speech: {str(e)}")
-    
+
     def set_voice_properties(self, rate=None, volume=None):
         """
         Set voice properties for pyttsx3 engine
-        
+
         Args:
             rate (int): Speaking rate (words per minute)
             volume (float): Volume (0.0 to 1.0)
@@ -46,4 +99,4 @@ class VoiceGenerator:
         if rate:
             self.engine.setProperty('rate', rate)
         if volume:
-            self.engine.setProperty('volume', volume)
\ No newline at end of file
+            self.engine.setProperty('volume', volume)